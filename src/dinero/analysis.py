@@ -2,6 +2,7 @@ import pandas as pd
 from loguru import logger
 
 from dinero import Application
+from dinero import db
 from dinero.db import Transaction
 
 pd.options.display.float_format = "{:,.2f}".format
@@ -12,11 +13,23 @@ app = Application()
 
 def get_dataframe():
     """Get data from the DB and reteurn a pandas.DataFrame"""
-    con = app.config.database.connection_string
-    df = pd.read_sql(Transaction.__tablename__, con=con)
+    df = pd.read_sql(Transaction.__tablename__, con=app.engine)
     return df
 
 
+def get_ledger_dataframe(start=None, end=None):
+    """Get only the date, account, description and amount columns
+    Loaded through the compact `ledger.Ledger`, much lighter than `get_dataframe()`
+    """
+    session = db.get_session(app)
+    try:
+        return db.load_ledger(
+            session, start, end, timezone=app.config.timezone
+        ).to_frame()
+    finally:
+        session.close()
+
+
 def select(data=None, year=None, month=None, before=None, after=None, account=None):
     selected = data if data is not None else get_dataframe()
 
@@ -1,5 +1,7 @@
 from typing import Union
 
+from sqlalchemy import Engine, create_engine
+
 from dinero.config.config_file import ConfigFile
 from dinero.config.model import RootConfig
 from dinero.utils.fs import Path
@@ -9,6 +11,10 @@ class Application:
     config_file_path: Union[Path, None]
     config_file: ConfigFile
 
+    # Engines shared by all the Application instances of the process
+    # {connection_string: Engine}
+    _engines: dict[str, Engine] = {}
+
     def __init__(
         self,
         config_file: Union[str, None] = None,  # Path to config file
@@ -22,6 +28,8 @@ class Application:
             path_ = None if config_file is None else Path(config_file)
             self.config_file = ConfigFile(path=path_)
 
+        self._rules = None
+
         if load_config:
             self.load_config()
 
@@ -32,6 +40,32 @@ class Application:
     def config(self) -> RootConfig:
         return self.config_file.model
 
+    @property
+    def engine(self) -> Engine:
+        """SQLAlchemy engine for the configured DB
+        Created on first use and reused by the process to keep a single pool
+        """
+        database = self.config.database
+        engine = self._engines.get(database.connection_string)
+        if engine is None:
+            engine = create_engine(
+                database.connection_string,
+                pool_size=database.pool_size,
+                pool_pre_ping=database.pool_pre_ping,
+                pool_recycle=database.pool_recycle,
+            )
+            self._engines[database.connection_string] = engine
+        return engine
+
+    @property
+    def rules(self):
+        """Category rules shared by all the ingestion paths, see `rules.RuleSet`"""
+        if self._rules is None:
+            from dinero.rules import RuleSet
+
+            self._rules = RuleSet(self.config_dir / "category_rules.json")
+        return self._rules
+
     @property
     def config_dir(self):
         return self.config_file.configdir()
@@ -1,9 +1,10 @@
 import click
+from tabulate import tabulate
 from loguru import logger
-from sqlalchemy import create_engine
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from sqlalchemy_utils import create_database, database_exists
 
-from dinero import Application
+from dinero import Application, db
 from dinero.cli import utils
 from dinero.db import Transaction
 
@@ -15,7 +16,7 @@ def init_db():
 
     conn_string = app.config.database.connection_string
 
-    engine = create_engine(conn_string)
+    engine = app.engine
 
     if not database_exists(engine.url):
         if utils.noninteractive() or utils.query_yes_no(
@@ -29,3 +30,51 @@ def init_db():
     if utils.noninteractive() or utils.query_yes_no("Create tables?"):
         Transaction.metadata.create_all(engine)
         print("Table created")
+        for name in db.add_missing_columns(engine):
+            print(f"Column added: {name}")
+
+        try:
+            db.create_dedup_index(app, engine)
+            print("Unique index created")
+        except IntegrityError:
+            logger.error(
+                "Could not create the unique index, the table has duplicated transactions"
+            )
+
+        if db.search_index_name(engine):
+            try:
+                db.create_search_index(engine)
+                print("Search index created")
+            except DBAPIError as e:
+                logger.error(f"Could not create the search index: {e}")
+
+
+@click.command()
+def db_indexes():
+    """Add the missing columns and indexes to an existing DB and print index sizes."""
+    app = Application()
+    engine = app.engine
+
+    for name in db.add_missing_columns(engine):
+        print(f"Column added: {name}")
+    created, failed = db.create_indexes(app, engine)
+
+    for name in created:
+        print(f"Index created: {name}")
+    for name, error in failed.items():
+        if isinstance(error, IntegrityError):
+            logger.error(
+                f"Could not create the index {name}, "
+                "the table has duplicated transactions"
+            )
+        else:
+            logger.error(f"Could not create the index {name}: {error}")
+    if not created and not failed:
+        print("All indexes already exist.")
+    print()
+
+    table_data = [
+        [name, "n/a" if size is None else f"{size / 1024:,.0f} KB"]
+        for name, size in db.index_sizes(engine).items()
+    ]
+    print(tabulate(table_data, headers=["index", "size"], tablefmt="simple"))
@@ -10,46 +10,147 @@ Example:
 
 Usage:
     dinero import-csv ./transactions.csv --account "Brokerage Account"
+
+Large files can be imported in chunks with bounded memory:
+    dinero import-csv ./transactions.csv "Brokerage Account" --chunk-size 10000
+
+Each chunk is committed on its own and the last committed row is saved as a
+checkpoint, running the same command again resumes after it.
+
+Big files that fit in memory can be parsed with pandas column operations:
+    dinero import-csv ./transactions.csv "Brokerage Account" --engine vectorized
+
+Several files or globs can be imported in one go, for multiple accounts use
+a JSON manifest that maps files or globs to account names:
+    dinero import-csv "./statements/*.csv" "Brokerage Account"
+    dinero import-csv --manifest ./statements/manifest.json
+
+    {"checking-*.csv": "Checking", "brokerage/*.csv": "Brokerage Account"}
+
+Relative paths in the manifest are relative to the manifest file. Files are
+parsed in parallel and committed in one transaction.
 """
 
 import csv
+import glob
+import importlib.util
+import itertools
+import json
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import click
+import pandas as pd
 import pendulum
 from loguru import logger
+from tabulate import tabulate
 
-from dinero import Application, db, rules
+from dinero import Application, db
 from dinero.cli import utils
+from dinero.utils.fs import JSONCache
 
 
 @click.command()
-@click.argument("file")
-@click.argument("account")
-def import_csv(file: str, account: str):
-    """Import transactions from a CSV file.
-
-    FILE is the path to the CSV file to import.
+@click.argument("files", metavar="FILE...", nargs=-1)
+@click.argument("account", required=False)
+@click.option(
+    "--manifest",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="JSON file that maps files or globs to account names.",
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="Files parsed in parallel. Default: number of CPUs.",
+)
+@click.option(
+    "--insert",
+    "insert_mode",
+    type=click.Choice(["orm", "upsert", "bulk"]),
+    default="orm",
+    show_default=True,
+    help=(
+        "How to insert new records: ORM, ON CONFLICT DO NOTHING without "
+        "loading existing rows or COPY/executemany."
+    ),
+)
+@click.option(
+    "--chunk-size",
+    type=int,
+    default=None,
+    help="Stream the file and dedup and commit every N rows, resuming from a checkpoint.",
+)
+@click.option(
+    "--restart",
+    is_flag=True,
+    default=False,
+    help="Ignore the checkpoint of a previous chunked import of the file.",
+)
+@click.option(
+    "--engine",
+    type=click.Choice(["python", "vectorized"]),
+    default="python",
+    show_default=True,
+    help="Parse row by row or with pandas column operations.",
+)
+def import_csv(
+    files: tuple[str],
+    account: str,
+    manifest: str,
+    workers: int,
+    insert_mode: str,
+    chunk_size: int,
+    restart: bool,
+    engine: str,
+):
+    """Import transactions from CSV files.
+
+    FILE is the path to the CSV file to import, can be a glob and be
+    repeated.
 
     ACCOUNT is the account name to associate with all transactions.
     """
     app = Application()
-    csv_path = Path(file)
+    jobs = resolve_jobs(files, account, manifest)
 
-    if not csv_path.exists():
-        logger.error(f"File not found: {csv_path}")
-        sys.exit(1)
+    if manifest or len(jobs) > 1:
+        if chunk_size:
+            raise click.UsageError("--chunk-size only works with a single file")
+        import_files(app, jobs, insert_mode=insert_mode, engine=engine, workers=workers)
+        return
+
+    csv_path, account = jobs[0]
+
+    if chunk_size:
+        if engine != "python":
+            raise click.UsageError("--chunk-size only works with --engine python")
+        import_chunks(app, csv_path, account, chunk_size, insert_mode, restart)
+        return
 
     # Parse CSV file
-    transactions = parse_csv(app, csv_path, account)
+    transactions = parse_csv(app, csv_path, account, engine=engine)
 
     if not transactions:
         logger.warning("No transactions found in CSV file")
         return
 
-    # Load existing transactions and check for duplicates
-    table = db.Table(app)
+    table = db.Table(app, window=True)
+
+    if insert_mode == "upsert":
+        print(f"Transactions in CSV: {len(transactions)}")
+        if utils.noninteractive() or utils.query_yes_no("Import these transactions?"):
+            inserted, skipped = table.upsert(transactions)
+            print(f"Inserted: {inserted}")
+            print(f"Already existing (skipped): {skipped}")
+        else:
+            print("Import cancelled.")
+        return
+
+    # Load existing transactions in the CSV date range and check for duplicates
     new, existing = table.prepare_from_records(transactions)
 
     # Display summary
@@ -80,20 +181,445 @@ def import_csv(file: str, account: str):
     # Confirm and commit
     if utils.noninteractive() or utils.query_yes_no("Import these transactions?"):
         print(f"Inserting {len(new)} new records...")
-        table.commit()
-        print("Done")
+        inserted, skipped = table.commit(mode=insert_mode)
+        print(f"Done. Inserted: {inserted} Skipped: {skipped}")
     else:
         print("Import cancelled.")
 
 
-def parse_csv(app: Application, csv_path: Path, account: str) -> list[db.Transaction]:
+def resolve_jobs(
+    files: tuple[str], account: str | None, manifest: str | None
+) -> list[tuple[Path, str]]:
+    """Files to import from the FILE and ACCOUNT arguments or a manifest
+
+    Exits if a file doesn't exist or there are no files.
+
+    Returns
+    -------
+        list of (path, account)
+    """
+    if manifest:
+        if files or account:
+            raise click.UsageError("FILE and ACCOUNT can't be used with --manifest")
+        jobs = read_manifest(Path(manifest))
+    else:
+        if not files or not account:
+            raise click.UsageError("Missing FILE and ACCOUNT or --manifest")
+        jobs = [(path, account) for pattern in files for path in expand_glob(pattern)]
+
+    # The same file can match more than one glob
+    jobs = list(dict.fromkeys(jobs))
+    for path, _ in jobs:
+        if not path.exists():
+            logger.error(f"File not found: {path}")
+            sys.exit(1)
+    if not jobs:
+        logger.error("No files found")
+        sys.exit(1)
+    return jobs
+
+
+def expand_glob(pattern: str, root: Path | None = None) -> list[Path]:
+    """Files matching `pattern` sorted by name or `[Path(pattern)]` if it's
+    not a glob. Relative patterns are relative to `root` if it's passed.
+    """
+    if root is not None:
+        pattern = str(root / pattern)
+    if not glob.has_magic(pattern):
+        return [Path(pattern)]
+
+    paths = [Path(path) for path in sorted(glob.glob(pattern, recursive=True))]
+    if not paths:
+        logger.warning(f"No files match: {pattern}")
+    return paths
+
+
+def read_manifest(path: Path) -> list[tuple[Path, str]]:
+    """Read a JSON manifest of {file or glob: account name}
+
+    Returns
+    -------
+        list of (csv_path, account)
+    """
+    data = json.loads(path.read_text("utf-8"))
+    if not isinstance(data, dict):
+        logger.error(f"Manifest must be a JSON object of file: account: {path}")
+        sys.exit(1)
+
+    root = path.resolve().parent
+    return [
+        (csv_path, account)
+        for pattern, account in data.items()
+        for csv_path in expand_glob(pattern, root=root)
+    ]
+
+
+def import_files(
+    app: Application,
+    jobs: list[tuple[Path, str]],
+    insert_mode="orm",
+    engine="python",
+    workers=None,
+):
+    """Import several CSV files in one transaction
+
+    The files are parsed in a process pool and then passed to
+    `import_records()`.
+
+    Parameters
+    ----------
+        jobs: list of (csv_path, account)
+    """
+    records_by_file = parse_files(jobs, engine=engine, workers=workers)
+    import_records(app, jobs, records_by_file, insert_mode=insert_mode)
+
+
+def import_records(
+    app: Application,
+    jobs: list[tuple[Path, str]],
+    records_by_file: list[list[db.Transaction]],
+    insert_mode="orm",
+):
+    """Dedup and commit the records of several files in one transaction
+
+    All the records are deduped against one `db.Table` and a summary of
+    new and existing records per file is printed before committing.
+
+    Parameters
+    ----------
+        jobs: list of (path, account)
+        records_by_file: Transactions of each file in `jobs`
+    """
+    records = [record for file_records in records_by_file for record in file_records]
+
+    # One window query and dedup index for all the files
+    table = db.Table(app, window=True)
+    new, existing = table.prepare_from_records(records)
+    new_ids = {id(record) for record in new}
+
+    summary = []
+    for (path, account), file_records in zip(jobs, records_by_file):
+        n_records = len(file_records)
+        n_new = sum(id(record) in new_ids for record in file_records)
+        summary.append([str(path), account, n_records, n_new, n_records - n_new])
+    summary.append(["Total", "", len(records), len(new), len(existing)])
+
+    print(
+        tabulate(
+            summary,
+            headers=["file", "account", "transactions", "new", "existing"],
+            tablefmt="simple",
+        )
+    )
+    print()
+
+    if not new:
+        print("No new transactions to import.")
+        return
+
+    if utils.noninteractive() or utils.query_yes_no("Import these transactions?"):
+        print(f"Inserting {len(new)} new records...")
+        inserted, skipped = table.commit(mode=insert_mode)
+        print(f"Done. Inserted: {inserted} Skipped: {skipped}")
+    else:
+        print("Import cancelled.")
+
+
+def parse_files(
+    jobs: list[tuple[Path, str]], engine="python", workers=None
+) -> list[list[db.Transaction]]:
+    """Parse CSV files in a process pool
+
+    Returns
+    -------
+        A list of Transactions per file, in the same order as `jobs`
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_parse_file_rows, csv_path, account, engine)
+            for csv_path, account in jobs
+        ]
+
+        records_by_file = []
+        for (csv_path, _), future in zip(jobs, futures):
+            try:
+                rows = future.result()
+            except SystemExit:
+                # Validation errors are logged by the worker
+                logger.error(f"Failed to parse: {csv_path}")
+                sys.exit(1)
+            records_by_file.append([db.Transaction(**row) for row in rows])
+
+    return records_by_file
+
+
+def _parse_file_rows(csv_path: Path, account: str, engine: str) -> list[dict]:
+    """Run `parse_csv()` in a worker process, returns the records as dicts"""
+    app = Application()
+    return [t.to_row() for t in parse_csv(app, csv_path, account, engine=engine)]
+
+
+def import_chunks(
+    app: Application,
+    csv_path: Path,
+    account: str,
+    chunk_size: int,
+    insert_mode="orm",
+    restart=False,
+):
+    """Import a CSV file in chunks of `chunk_size` rows
+
+    Each chunk is deduped and committed on its own and then the row number
+    of its last row is saved as a checkpoint. If there is a checkpoint for
+    the same file and account the import resumes after it.
+    """
+    checkpoint = Checkpoint(app, csv_path, account)
+    start_row = 0 if restart else checkpoint.load()
+
+    print("=" * 80)
+    print(f"Import from: {csv_path}")
+    print(f"Account: {account}")
+    print(f"Chunk size: {chunk_size}")
+    if start_row:
+        print(f"Resuming after row: {start_row}")
+    print("=" * 80)
+
+    if not (utils.noninteractive() or utils.query_yes_no("Import this file?")):
+        print("Import cancelled.")
+        return
+
+    rows = iter_csv(app, csv_path, account, start_row=start_row)
+    n_inserted = n_skipped = 0
+
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        last_row = chunk[-1][0]
+        records = [transaction for _, transaction in chunk]
+
+        # A Table per chunk so the loaded records don't grow with the file
+        table = db.Table(app, window=True)
+        if insert_mode == "upsert":
+            inserted, skipped = table.upsert(records)
+        else:
+            new, existing = table.prepare_from_records(records)
+            inserted, skipped = table.commit(mode=insert_mode)
+            skipped += len(existing)
+        table.close()
+
+        checkpoint.save(last_row)
+        n_inserted, n_skipped = n_inserted + inserted, n_skipped + skipped
+        logger.bind(row=last_row, inserted=inserted, skipped=skipped).info(
+            "Chunk committed"
+        )
+
+    checkpoint.remove()
+    print(f"Done. Inserted: {n_inserted} Already existing (skipped): {n_skipped}")
+
+
+class Checkpoint:
+    """Last committed row of a chunked import
+
+    Saved on a `JSONCache` in `app.cache_dir / "import-checkpoints"` keyed by
+    the CSV path and account. It's ignored if the file size or mtime changed.
+    """
+
+    def __init__(self, app: Application, csv_path: Path, account: str):
+        self.csv_path = csv_path.resolve()
+        self.files = JSONCache(app.cache_dir / "import-checkpoints")
+        self.key = [str(self.csv_path), account]
+
+    def _file_id(self):
+        stat = self.csv_path.stat()
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def load(self) -> int:
+        """Last committed row number or 0"""
+        data = self.files.get(self.key)
+        if data is None:
+            return 0
+        if data["file"] != self._file_id():
+            logger.warning("File changed since the last import, ignoring checkpoint")
+            return 0
+        return data["row"]
+
+    def save(self, row: int):
+        self.files.set(self.key, {"file": self._file_id(), "row": row})
+
+    def remove(self):
+        self.files.delete(self.key)
+
+
+def parse_csv(
+    app: Application, csv_path: Path, account: str, engine="python"
+) -> list[db.Transaction]:
     """Parse a CSV file and return a list of Transaction objects.
 
     Expected columns: date, description, amount
     Optional columns: category, subcategory
+
+    Parameters
+    ----------
+        engine (str): "python" to parse row by row or "vectorized" to use
+            `parse_csv_vectorized()`
     """
+    start = time.perf_counter()
+    if engine == "vectorized":
+        transactions = parse_csv_vectorized(app, csv_path, account)
+    else:
+        transactions = [t for _, t in iter_csv(app, csv_path, account)]
+
+    logger.bind(
+        engine=engine,
+        rows=len(transactions),
+        seconds=round(time.perf_counter() - start, 3),
+    ).info("Parsed CSV")
+    return transactions
+
+
+def parse_csv_vectorized(
+    app: Application, csv_path: Path, account: str
+) -> list[db.Transaction]:
+    """Parse a CSV file with pandas column operations
+
+    Same validation and error messages as `parse_row()`, the first invalid
+    row in the file is reported. Dates and amounts that the vectorized
+    parsers don't understand go through `pendulum.parse()` and `float()`
+    so both engines accept the same values.
+    """
+    df = read_csv_frame(csv_path)
+
+    # Validate required columns
+    required_columns = {"date", "description", "amount"}
+    if not required_columns.issubset(set(df.columns)):
+        missing = required_columns - set(df.columns)
+        logger.error(f"Missing required columns: {missing}")
+        logger.info("Required columns: date, description, amount")
+        sys.exit(1)
+
+    # Row number in the file, the header is row 1
+    df["row_num"] = df.index + 2
+    for column in ["date", "description", "amount", "category", "subcategory"]:
+        if column in df.columns:
+            df[column] = df[column].str.strip()
+        else:
+            df[column] = ""
+
+    # Skip empty rows
+    empty = (df["date"] == "") & (df["description"] == "") & (df["amount"] == "")
+    df = df[~empty].reset_index(drop=True)
+
+    # Parse dates (ISO format: YYYY-MM-DD) in the configured timezone
+    tz = app.config.timezone
+    try:
+        dates = pd.to_datetime(df["date"], format="ISO8601", errors="coerce")
+    except ValueError:
+        # Naive dates mixed with UTC offsets, all the dates go to pendulum
+        dates = pd.Series([pd.NaT] * len(df), dtype=object)
+    if isinstance(dates.dtype, pd.DatetimeTZDtype):
+        dates = list(dates.dt.to_pydatetime())
+    elif pd.api.types.is_datetime64_dtype(dates.dtype):
+        # Ambiguous and nonexistent local times are left to pendulum
+        dates = dates.dt.tz_localize(tz, ambiguous="NaT", nonexistent="NaT")
+        dates = list(dates.dt.to_pydatetime())
+    else:
+        # Mixed UTC offsets
+        dates = [pd.NaT] * len(df)
+
+    invalid_date = []
+    for i, (date, date_str) in enumerate(zip(dates, df["date"])):
+        if pd.isna(date) and date_str:
+            try:
+                dates[i] = pendulum.parse(date_str, tz=tz)
+            except Exception:
+                invalid_date.append(i)
+
+    # Parse amounts
+    amount_strs = df["amount"].str.replace(",", "", regex=False)
+    amounts = pd.to_numeric(amount_strs, errors="coerce").tolist()
+    invalid_amount = []
+    for i, (amount, amount_str) in enumerate(zip(amounts, amount_strs)):
+        if pd.isna(amount) and amount_str:
+            try:
+                amounts[i] = float(amount_str)
+            except ValueError:
+                invalid_amount.append(i)
+
+    # Validate, checks in the same order as parse_row()
+    checks = [
+        (df["date"] == "", lambda i: "Missing date"),
+        (df["description"] == "", lambda i: "Missing description"),
+        (df["amount"] == "", lambda i: "Missing amount"),
+        (
+            df.index.isin(invalid_date),
+            lambda i: (
+                f"Invalid date format: '{df['date'][i]}'. "
+                "Expected ISO format (YYYY-MM-DD)"
+            ),
+        ),
+        (
+            df.index.isin(invalid_amount),
+            lambda i: f"Invalid amount: '{df['amount'][i]}'",
+        ),
+    ]
+    invalid = pd.Series(False, index=df.index)
+    for mask, _ in checks:
+        invalid |= mask
+    if invalid.any():
+        i = invalid.idxmax()
+        message = next(message(i) for mask, message in checks if mask[i])
+        logger.error(f"Row {df['row_num'][i]}: {message}")
+        sys.exit(1)
+
+    # Get category from CSV or from rules, each description is matched once
+    uncategorized = df["category"] == ""
+    if uncategorized.any():
+        descriptions = df.loc[uncategorized, "description"].unique()
+        matches = dict(zip(descriptions, app.rules.categorize_batch(descriptions)))
+        matched = df.loc[uncategorized, "description"].map(matches).tolist()
+        df.loc[uncategorized, "category"] = [category for category, _ in matched]
+        df.loc[uncategorized, "subcategory"] = [subcat for _, subcat in matched]
+
     transactions = []
+    for date, description, amount, category, subcategory in zip(
+        dates,
+        df["description"].tolist(),
+        amounts,
+        df["category"].tolist(),
+        df["subcategory"].tolist(),
+    ):
+        t = db.Transaction()
+        t.date = date
+        t.description = description
+        t.amount = amount
+        t.category = category
+        t.subcategory = subcategory
+        t.notes = "csv-import"
+        t.account = account
+        transactions.append(t)
+
+    return transactions
+
+
+def read_csv_frame(csv_path: Path) -> pd.DataFrame:
+    """Read a CSV file as a DataFrame of strings
 
+    Uses the pyarrow engine if it's installed and the C engine otherwise
+    or when pyarrow can't read the file (e.g. rows with missing fields).
+    """
+    options = dict(dtype=str, keep_default_na=False, encoding="utf-8")
+    if importlib.util.find_spec("pyarrow") is not None:
+        try:
+            return pd.read_csv(csv_path, engine="pyarrow", **options).fillna("")
+        except pd.errors.ParserError:
+            pass
+    return pd.read_csv(csv_path, **options).fillna("")
+
+
+def iter_csv(app: Application, csv_path: Path, account: str, start_row=0):
+    """Parse a CSV file one row at a time
+
+    Yields (row number, Transaction), rows up to `start_row` are skipped
+    without parsing them. Same validation as `parse_csv()`.
+    """
     with open(csv_path, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
 
@@ -108,15 +634,15 @@ def parse_csv(app: Application, csv_path: Path, account: str) -> list[db.Transac
         for row_num, row in enumerate(
             reader, start=2
         ):  # start=2 because row 1 is header
+            if row_num <= start_row:
+                continue
             try:
                 transaction = parse_row(app, row, account, row_num)
-                if transaction:
-                    transactions.append(transaction)
             except ValueError as e:
                 logger.error(f"Row {row_num}: {e}")
                 sys.exit(1)
-
-    return transactions
+            if transaction:
+                yield row_num, transaction
 
 
 def parse_row(
@@ -158,7 +684,7 @@ def parse_row(
     subcategory = row.get("subcategory", "").strip()
 
     if not category:
-        category, subcategory = rules.categories_for_transaction(app, description)
+        category, subcategory = app.rules.categorize(description)
 
     # Create Transaction object
     t = db.Transaction()
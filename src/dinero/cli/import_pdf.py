@@ -0,0 +1,303 @@
+"""Import transactions from PDF statements into the database.
+
+Tables are extracted with pdfplumber. A table is imported if its first row
+is a header with date, description and amount columns (see `HEADERS`), tables
+without a header continue the last imported table if they have the same
+number of columns (statements that span pages).
+
+Usage:
+    dinero import-pdf ./statement.pdf "Checking"
+    dinero import-pdf "./statements/*.pdf" "Checking"
+    dinero import-pdf --manifest ./statements/manifest.json
+
+Rows are validated like `import-csv` rows, US dates (MM/DD/YYYY) and
+amounts like "$1,200.00" or "(1,200.00)" are accepted too.
+
+The tables extracted from each page are cached by the SHA-256 of the file
+so importing the same statements again doesn't parse them again.
+"""
+
+import datetime
+import hashlib
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import click
+import pdfplumber
+from loguru import logger
+
+from dinero import Application, db
+from dinero.cli.import_csv import import_records, parse_row, resolve_jobs
+from dinero.utils.fs import JSONCache
+
+
+# Header names of each column, compared in lowercase
+HEADERS = {
+    "date": {
+        "date",
+        "trans date",
+        "transaction date",
+        "post date",
+        "posted date",
+        "posting date",
+    },
+    "description": {
+        "description",
+        "details",
+        "transaction",
+        "transaction description",
+        "merchant",
+        "payee",
+    },
+    "amount": {"amount", "amount ($)", "transaction amount"},
+}
+
+DATE_FORMATS = ["%m/%d/%Y", "%m/%d/%y", "%m-%d-%Y"]
+
+# Bump when the extraction changes so existing cache files are ignored
+CACHE_VERSION = 1
+
+
+@click.command()
+@click.argument("files", metavar="FILE...", nargs=-1)
+@click.argument("account", required=False)
+@click.option(
+    "--manifest",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="JSON file that maps files or globs to account names.",
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="Pages parsed in parallel. Default: number of CPUs.",
+)
+@click.option(
+    "--insert",
+    "insert_mode",
+    type=click.Choice(["orm", "upsert", "bulk"]),
+    default="orm",
+    show_default=True,
+    help="How to insert new records.",
+)
+@click.option(
+    "--refresh",
+    is_flag=True,
+    default=False,
+    help="Extract the pages again instead of using the cache.",
+)
+def import_pdf(
+    files: tuple[str],
+    account: str,
+    manifest: str,
+    workers: int,
+    insert_mode: str,
+    refresh: bool,
+):
+    """Import transactions from PDF statements.
+
+    FILE is the path to the PDF file to import, can be a glob and be
+    repeated.
+
+    ACCOUNT is the account name to associate with all transactions.
+    """
+    app = Application()
+    jobs = resolve_jobs(files, account, manifest)
+
+    records_by_file = parse_pdfs(app, jobs, workers=workers, use_cache=not refresh)
+    import_records(app, jobs, records_by_file, insert_mode=insert_mode)
+
+
+def parse_pdfs(
+    app: Application, jobs: list[tuple[Path, str]], workers=None, use_cache=True
+) -> list[list[db.Transaction]]:
+    """Parse PDF statements into Transactions
+
+    Pages that are not in the cache are extracted in a process pool.
+
+    Returns
+    -------
+        A list of Transactions per file, in the same order as `jobs`
+    """
+    caches = [PageCache(app, pdf_path) for pdf_path, _ in jobs]
+    if not use_cache:
+        for cache in caches:
+            cache.clear()
+
+    pending = [(cache, page) for cache in caches for page in cache.missing_pages()]
+    logger.bind(
+        files=len(jobs), pages=sum(cache.n_pages for cache in caches)
+    ).info(f"Extracting {len(pending)} pages")
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                extract_page,
+                [cache.pdf_path for cache, _ in pending],
+                [page for _, page in pending],
+            )
+            for (cache, page), tables in zip(pending, results):
+                cache.set(page, tables)
+
+        for cache in caches:
+            cache.save()
+
+    return [
+        parse_tables(app, pdf_path, account, cache.pages())
+        for (pdf_path, account), cache in zip(jobs, caches)
+    ]
+
+
+def extract_page(pdf_path: Path, page: int) -> list[list[list[str | None]]]:
+    """Tables on a page (1-based), runs in a worker process"""
+    with pdfplumber.open(pdf_path) as pdf:
+        return pdf.pages[page - 1].extract_tables()
+
+
+def parse_tables(
+    app: Application, pdf_path: Path, account: str, pages
+) -> list[db.Transaction]:
+    """Parse the extracted tables of a PDF file with `parse_row()`
+
+    Parameters
+    ----------
+        pages: list of (page number, tables on the page)
+    """
+    transactions = []
+    columns = None  # {field: column index} of the last table with a header
+    width = None
+
+    for page, tables in pages:
+        for table in tables:
+            rows = [[clean_cell(cell) for cell in row] for row in table]
+            if not rows:
+                continue
+
+            header = header_columns(rows[0])
+            if header:
+                columns, width = header, len(rows[0])
+                start = 1
+            elif columns is not None and len(rows[0]) == width:
+                start = 0
+            else:
+                continue
+
+            for row_num, row in enumerate(rows[start:], start=start + 1):
+                values = {
+                    field: row[i] if i < len(row) else ""
+                    for field, i in columns.items()
+                }
+                values["date"] = normalize_date(values["date"])
+                values["amount"] = normalize_amount(values["amount"])
+                try:
+                    transaction = parse_row(app, values, account, row_num)
+                except ValueError as e:
+                    logger.error(f"{pdf_path} page {page} row {row_num}: {e}")
+                    sys.exit(1)
+                if transaction:
+                    transaction.notes = "pdf-import"
+                    transactions.append(transaction)
+
+    return transactions
+
+
+def header_columns(row: list[str]) -> dict[str, int] | None:
+    """{field: column index} if `row` is a header with all the fields in
+    `HEADERS` or None
+    """
+    columns = {}
+    for i, cell in enumerate(row):
+        for field, names in HEADERS.items():
+            if field not in columns and cell.lower() in names:
+                columns[field] = i
+    return columns if len(columns) == len(HEADERS) else None
+
+
+def clean_cell(cell: str | None) -> str:
+    """Cell text in one line"""
+    return " ".join((cell or "").split())
+
+
+def normalize_date(value: str) -> str:
+    """US dates as ISO, other values are returned as they are"""
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, date_format).date().isoformat()
+        except ValueError:
+            pass
+    return value
+
+
+def normalize_amount(value: str) -> str:
+    """Remove currency symbols, "(1.00)" and "1.00-" are negative"""
+    value = re.sub(r"[$\s]", "", value)
+    if value.startswith("(") and value.endswith(")"):
+        return "-" + value[1:-1]
+    if value.endswith("-"):
+        return "-" + value[:-1]
+    return value
+
+
+class PageCache:
+    """Tables extracted from each page of a PDF file
+
+    Saved on a `JSONCache` in `app.cache_dir / "pdf-pages"` keyed by the
+    SHA-256 of the PDF file so renamed or moved files are still cached.
+    """
+
+    def __init__(self, app: Application, pdf_path: Path):
+        self.pdf_path = pdf_path
+        self.files = JSONCache(app.cache_dir / "pdf-pages")
+        self.key = file_sha256(pdf_path)
+
+        self.n_pages = None
+        self.tables = {}  # {page: tables}
+        self.changed = False
+        self.load()
+
+    def load(self):
+        data = self.files.get(self.key)
+        if data is None or data.get("version") != CACHE_VERSION:
+            return
+        self.n_pages = data["pages"]
+        self.tables = {int(page): tables for page, tables in data["tables"].items()}
+
+    def clear(self):
+        self.n_pages = None
+        self.tables = {}
+
+    def missing_pages(self) -> list[int]:
+        """Page numbers (1-based) that are not cached"""
+        if self.n_pages is None:
+            with pdfplumber.open(self.pdf_path) as pdf:
+                self.n_pages = len(pdf.pages)
+            self.changed = True
+        return [
+            page for page in range(1, self.n_pages + 1) if page not in self.tables
+        ]
+
+    def set(self, page: int, tables):
+        self.tables[page] = tables
+        self.changed = True
+
+    def pages(self):
+        """(page, tables) sorted by page"""
+        return sorted(self.tables.items())
+
+    def save(self):
+        if not self.changed:
+            return
+        data = {"version": CACHE_VERSION, "pages": self.n_pages, "tables": self.tables}
+        self.files.set(self.key, data)
+        self.changed = False
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -5,8 +5,9 @@ from loguru import logger
 
 from dinero import Application
 from dinero.cli.cache import cache
-from dinero.cli.db import init_db
+from dinero.cli.db import db_indexes, init_db
 from dinero.cli.import_csv import import_csv
+from dinero.cli.import_pdf import import_pdf
 from dinero.cli.mkdataset import mkdataset
 from dinero.cli.mkrules import gen_rules
 from dinero.cli.search import search
@@ -39,10 +40,12 @@ def config_cmd():
 
 
 main.add_command(init_db, "init-db")
+main.add_command(db_indexes, "db-indexes")
 main.add_command(mkdataset, "mkdataset")
 main.add_command(transactions, "transactions")
 main.add_command(gen_rules, "mkrules")
 main.add_command(import_csv, "import-csv")
+main.add_command(import_pdf, "import-pdf")
 main.add_command(search, "search")
 main.add_command(cache, "build-cache")
 
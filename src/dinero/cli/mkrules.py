@@ -1,8 +1,10 @@
 import json
+import os
 
 import click
 
 from dinero import Application, analysis
+from dinero.rules import PATTERNS_KEY
 from dinero.cli import utils
 
 
@@ -24,8 +26,16 @@ def gen_rules():
     if utils.noninteractive() or utils.query_yes_no(
         '\nDo you want to save these rules to "%s"?' % TARGET
     ):
+        # Keep the pattern rules, they are written by hand
+        patterns = []
+        if os.path.exists(TARGET):
+            with open(TARGET, "r") as f:
+                patterns = json.load(f).get(PATTERNS_KEY, [])
+
         with open(TARGET, "w") as f:
             rules = {}
+            if patterns:
+                rules[PATTERNS_KEY] = patterns
             for index, row in most_common.iterrows():
                 rules[row["description"]] = [row["category"], row["subcategory"]]
             string = json.dumps(rules, sort_keys=True, indent=4, separators=(",", ": "))
@@ -1,13 +1,24 @@
+import base64
+import csv
+import hashlib
 import json
 import datetime
+import sys
+import time
 
 import click
+import pendulum
 from loguru import logger
-from sqlalchemy import select, extract
+from sqlalchemy import and_, false, or_, select, func
 from tabulate import tabulate
 
 from dinero.application import Application
-from dinero.db import Transaction, get_session
+from dinero.db import Transaction, explain, get_session, search_description
+from dinero.search_cache import SearchCache, last_table_write
+
+
+GROUP_BY = ["account", "category", "subcategory", "year", "month", "week"]
+AGGREGATES = ["sum", "count", "avg", "min", "max"]
 
 
 @click.command()
@@ -19,7 +30,10 @@ from dinero.db import Transaction, get_session
 @click.option(
     "--description",
     default=None,
-    help="Search description (case-insensitive partial match).",
+    help=(
+        "Search description, every word must be part of it "
+        "(case-insensitive partial match)."
+    ),
 )
 @click.option(
     "--after", default=None, help="Transactions on or after this date (YYYY-MM-DD)."
@@ -28,27 +42,77 @@ from dinero.db import Transaction, get_session
     "--before", default=None, help="Transactions on or before this date (YYYY-MM-DD)."
 )
 @click.option("--year", type=int, default=None, help="Filter by year.")
-@click.option("--month", type=int, default=None, help="Filter by month (1-12).")
+@click.option(
+    "--month", type=click.IntRange(1, 12), default=None, help="Filter by month (1-12)."
+)
 @click.option(
     "--limit",
     type=int,
     default=50,
     show_default=True,
-    help="Maximum number of rows to return.",
+    help="Maximum number of rows to return, 0 for no limit.",
+)
+@click.option(
+    "--cursor",
+    default=None,
+    help="Return the page after this cursor, printed after each page.",
 )
 @click.option(
     "--sort",
     default="date",
     show_default=True,
-    help="Column to sort by: date, amount, description, account, category.",
+    help=(
+        "Column to sort by: date, amount, description, account, category "
+        "or rank (best --description matches first)."
+    ),
 )
 @click.option("--desc/--asc", default=True, show_default=True, help="Sort direction.")
+@click.option(
+    "--group-by",
+    type=click.Choice(GROUP_BY),
+    multiple=True,
+    help=(
+        "Return totals per group instead of transactions, can be repeated. "
+        "Months are YYYY-MM and weeks the date of their Monday."
+    ),
+)
+@click.option(
+    "--agg",
+    "aggregates",
+    type=click.Choice(AGGREGATES),
+    multiple=True,
+    help=(
+        "Aggregate of the amount for --group-by, can be repeated. "
+        "Default: sum, count."
+    ),
+)
 @click.option(
     "--json",
     "json_output",
     is_flag=True,
     default=False,
-    help="Output as JSON instead of table.",
+    help="Output as JSON instead of table. Same as --format json.",
+)
+@click.option(
+    "--explain",
+    "show_plan",
+    is_flag=True,
+    default=False,
+    help="Print the query plan and execution time to stderr.",
+)
+@click.option(
+    "--cache/--no-cache",
+    "use_cache",
+    default=None,
+    help="Use and save cached results. Default: search.cache on the config.",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["table", "json", "ndjson", "csv"]),
+    default="table",
+    show_default=True,
+    help="Output format, ndjson and csv rows are streamed as they are read.",
 )
 def search(
     account,
@@ -60,17 +124,219 @@ def search(
     year,
     month,
     limit,
+    cursor,
     sort,
     desc,
+    group_by,
+    aggregates,
+    show_plan,
+    use_cache,
     json_output,
+    output_format,
 ):
-    """Search transactions in the database with filters."""
+    """Search transactions in the database with filters.
+
+    Dates are days on the configured timezone, --after and --before
+    include the whole day.
+    """
     app = Application()
+    if json_output:
+        output_format = "json"
+
+    params = dict(
+        account=account,
+        category=category,
+        subcategory=subcategory,
+        description=description,
+        after=after,
+        before=before,
+        year=year,
+        month=month,
+    )
+    # Cursors can only be used with the same filters and sort
+    query_id = query_digest(**params, sort=sort, desc=desc)
+
+    # Results of small searches are cached until the table changes
+    cache = None
+    search_config = app.config.search
+    if use_cache is None:
+        use_cache = search_config.cache
+    if (
+        use_cache
+        and not show_plan
+        and 0 < limit <= search_config.cache_max_rows
+    ):
+        cache = SearchCache.from_config(app)
+        cache_key = search_cache_key(
+            app,
+            params,
+            sort=sort,
+            desc=desc,
+            limit=limit,
+            cursor=cursor,
+            group_by=group_by,
+            aggregates=aggregates,
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            logger.debug("Search results from the cache")
+            n_rows = write_rows(cached["rows"], cached["headers"], output_format)
+            print_summary(n_rows, cached["noun"], output_format, cached["next_cursor"])
+            return
+
     session = get_session(app)
+    stmt, score = build_query(app, **params)
+
+    if group_by:
+        if cursor is not None:
+            raise click.UsageError("--cursor can't be used with --group-by")
+        stmt, headers = group_query(app, stmt, group_by, aggregates, sort, desc)
+        noun = "group"
+        keyset = False
+    else:
+        # Sorting
+        sort_column_map = {
+            "date": Transaction.date,
+            "amount": Transaction.amount,
+            "description": Transaction.description,
+            "account": Transaction.account,
+            "category": Transaction.category,
+            "subcategory": Transaction.subcategory,
+        }
+
+        if sort == "rank" and score is not None:
+            sort_column_map["rank"] = score
+
+        sort_col = sort_column_map.get(sort, Transaction.date)
+        keyset = sort_col is not score
+
+        # The id makes the order stable for the keyset pagination
+        if desc:
+            stmt = stmt.order_by(sort_col.desc(), Transaction.id.desc())
+        else:
+            stmt = stmt.order_by(sort_col.asc(), Transaction.id.asc())
+
+        if cursor is not None:
+            if not keyset:
+                raise click.UsageError("--cursor can't be used with --sort rank")
+            last_value, last_id = decode_cursor(cursor, query_id)
+            if sort_col is Transaction.date and last_value is not None:
+                last_value = datetime.datetime.fromisoformat(last_value)
+            nulls_high = app.engine.dialect.name == "postgresql"
+            stmt = stmt.where(
+                keyset_filter(sort_col, last_value, last_id, desc, nulls_high)
+            )
+
+        # Only the columns, the sort value is used for the next cursor
+        columns = [sort_col.label("sort_value"), *Transaction.__table__.columns]
+        stmt = stmt.with_only_columns(*columns)
+        headers = HEADERS
+        noun = "transaction"
+
+    # Limit
+    if limit:
+        stmt = stmt.limit(limit)
+
+    if show_plan:
+        print_plan(session, stmt)
+
+    # Execute in batches so big results are streamed
+    start = time.perf_counter()
+    results = session.execute(stmt.execution_options(yield_per=1000))
+
+    last = []  # Last row for the next cursor
+
+    def rows():
+        for result in results:
+            last[:] = [result]
+            yield dict(result._mapping) if group_by else format_row(result)
+
+    rows = rows() if cache is None else list(rows())
+    n_rows = write_rows(rows, headers, output_format)
+    session.close()
+    if show_plan:
+        print_timing(start, n_rows)
+
+    # A full page might not be the last one
+    next_cursor = None
+    if keyset and limit and n_rows == limit:
+        next_cursor = encode_cursor((last[0].sort_value, last[0].id), query_id)
+    print_summary(n_rows, noun, output_format, next_cursor)
+
+    if cache is not None:
+        cache.set(
+            cache_key,
+            {
+                "headers": headers,
+                "rows": rows,
+                "noun": noun,
+                "next_cursor": next_cursor,
+            },
+        )
+
+
+def print_summary(n_rows: int, noun: str, output_format: str, next_cursor=None):
+    """Log the number of results and print the next page cursor to stderr"""
+    if output_format in ("table", "json"):
+        if not n_rows:
+            logger.info("No transactions found matching the given filters.")
+            return
+        logger.info(f"Found {n_rows} {noun}(s)")
+
+    if next_cursor is not None:
+        click.echo(f"Next page: --cursor {next_cursor}", err=True)
+
+
+def search_cache_key(app: Application, params: dict, **options) -> list:
+    """Cache key of a search: the DB, the normalized parameters and the
+    table watermark so any change to the table gives a new key
+    """
+    params = dict(params)
+    if params["description"] is not None:
+        # The description search is case-insensitive and split on spaces
+        params["description"] = " ".join(params["description"].casefold().split())
+    options["group_by"] = list(dict.fromkeys(options["group_by"]))
+    options["aggregates"] = list(dict.fromkeys(options["aggregates"]))
+
+    return [
+        app.config.database.connection_string,
+        app.config.timezone,
+        params,
+        options,
+        table_watermark(app),
+    ]
 
+
+def table_watermark(app: Application) -> list:
+    """max(id), count and the time of the last `db.Table` write"""
+    with app.engine.connect() as conn:
+        max_id, count = conn.execute(
+            select(func.max(Transaction.id), func.count(Transaction.id))
+        ).one()
+    return [max_id, count, last_table_write(app)]
+
+
+def build_query(
+    app: Application,
+    account=None,
+    category=None,
+    subcategory=None,
+    description=None,
+    after=None,
+    before=None,
+    year=None,
+    month=None,
+):
+    """select(Transaction) with the search filters
+
+    Returns
+    -------
+        (stmt, score): score is the `--description` match score, None when
+            the DB can't rank the matches or there is no description filter
+    """
     stmt = select(Transaction)
+    score = None
 
-    # Apply filters
     if account is not None:
         stmt = stmt.where(Transaction.account == account)
 
@@ -81,81 +347,254 @@ def search(
         stmt = stmt.where(Transaction.subcategory == subcategory)
 
     if description is not None:
-        stmt = stmt.where(Transaction.description.ilike(f"%{description}%"))
+        stmt, score = search_description(stmt, app.engine, description)
+
+    # Dates are half-open [start, end) ranges so an index on date can be used
+    tz = app.config.timezone
+    start, end = None, None
 
     if after is not None:
-        after_date = datetime.datetime.strptime(after, "%Y-%m-%d")
-        stmt = stmt.where(Transaction.date >= after_date)
+        start = parse_day(after, tz, "--after")
 
     if before is not None:
-        before_date = datetime.datetime.strptime(before, "%Y-%m-%d")
-        stmt = stmt.where(Transaction.date <= before_date)
+        end = parse_day(before, tz, "--before").add(days=1)
 
     if year is not None:
-        stmt = stmt.where(extract("year", Transaction.date) == year)
-
-    if month is not None:
-        stmt = stmt.where(extract("month", Transaction.date) == month)
-
-    # Sorting
-    sort_column_map = {
-        "date": Transaction.date,
-        "amount": Transaction.amount,
-        "description": Transaction.description,
-        "account": Transaction.account,
-        "category": Transaction.category,
-        "subcategory": Transaction.subcategory,
-    }
+        if month is None:
+            period_start = pendulum.datetime(year, 1, 1, tz=tz)
+            period_end = period_start.add(years=1)
+        else:
+            period_start = pendulum.datetime(year, month, 1, tz=tz)
+            period_end = period_start.add(months=1)
+        start = period_start if start is None else max(start, period_start)
+        end = period_end if end is None else min(end, period_end)
 
-    sort_col = sort_column_map.get(sort, Transaction.date)
-    if desc:
-        stmt = stmt.order_by(sort_col.desc())
-    else:
-        stmt = stmt.order_by(sort_col.asc())
+    if start is not None:
+        stmt = stmt.where(Transaction.date >= start)
+    if end is not None:
+        stmt = stmt.where(Transaction.date < end)
 
-    # Limit
-    stmt = stmt.limit(limit)
+    if month is not None and year is None:
+        stmt = stmt.where(month_filter(app, month))
 
-    # Execute
-    results = session.scalars(stmt).all()
+    return stmt, score
 
-    if not results:
-        logger.info("No transactions found matching the given filters.")
-        session.close()
-        return
 
-    # Format output
-    rows = []
-    for t in results:
-        date_str = t.date.strftime("%Y-%m-%d") if t.date else ""
-        rows.append(
-            {
-                "id": t.id,
-                "date": date_str,
-                "description": t.description or "",
-                "category": t.category or "",
-                "subcategory": t.subcategory or "",
-                "amount": t.amount,
-                "account": t.account or "",
-                "notes": t.notes or "",
-            }
+def parse_day(value: str, tz: str, param_hint: str) -> pendulum.DateTime:
+    """Start of a YYYY-MM-DD day on the timezone"""
+    try:
+        day = datetime.datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise click.BadParameter(
+            f"'{value}' is not a YYYY-MM-DD date", param_hint=param_hint
         )
+    return pendulum.datetime(day.year, day.month, day.day, tz=tz)
 
-    if json_output:
-        print(json.dumps(rows, indent=2))
+
+def month_filter(app: Application, month: int):
+    """A month of any year: one range per year between the first and last
+    transaction, a query on the min and max that can use the date index
+    """
+    tz = app.config.timezone
+    with app.engine.connect() as conn:
+        first, last = conn.execute(
+            select(func.min(Transaction.date), func.max(Transaction.date))
+        ).one()
+    if first is None:
+        return false()
+
+    first_year = pendulum.instance(first, tz=tz).in_tz(tz).year
+    last_year = pendulum.instance(last, tz=tz).in_tz(tz).year
+    ranges = []
+    for year in range(first_year, last_year + 1):
+        start = pendulum.datetime(year, month, 1, tz=tz)
+        ranges.append(
+            and_(Transaction.date >= start, Transaction.date < start.add(months=1))
+        )
+    return or_(*ranges)
+
+
+def print_plan(session, stmt):
+    """Print the query plan to stderr, see `db.explain()`"""
+    lines = explain(session, stmt, analyze=True)
+    click.echo("\n".join(["Query plan:", *lines, ""]), err=True)
+
+
+def print_timing(start: float, n_rows: int):
+    elapsed = (time.perf_counter() - start) * 1000
+    click.echo(f"Execution time: {elapsed:,.1f} ms, rows: {n_rows}", err=True)
+
+
+def group_query(app: Application, stmt, group_by, aggregates, sort, desc):
+    """Turn the search into a GROUP BY with a row per group
+
+    Rows are sorted by `sort` if it's one of the groups or aggregates,
+    otherwise by the groups.
+
+    Returns
+    -------
+        (stmt, headers)
+    """
+    groups = [group_column(app, name) for name in dict.fromkeys(group_by)]
+    aggregates = [
+        aggregate_column(name) for name in dict.fromkeys(aggregates or ["sum", "count"])
+    ]
+    columns = {column.name: column for column in groups + aggregates}
+
+    order = [columns[sort]] if sort in columns else groups
+    stmt = (
+        stmt.with_only_columns(*groups, *aggregates)
+        .group_by(*groups)
+        .order_by(*[column.desc() if desc else column.asc() for column in order])
+    )
+    return stmt, list(columns)
+
+
+def group_column(app: Application, name: str):
+    """Column expression of a `--group-by` field labeled with its name
+
+    Dates are bucketed on the configured timezone: year "2026",
+    month "2026-01" and week by the date of its Monday "2026-01-05".
+    """
+    if name in ("account", "category", "subcategory"):
+        return getattr(Transaction, name).label(name)
+
+    dialect = app.engine.dialect.name
+    if dialect == "postgresql":
+        local = func.timezone(app.config.timezone, Transaction.date)
+        if name == "week":
+            local = func.date_trunc("week", local)
+        formats = {"year": "YYYY", "month": "YYYY-MM", "week": "YYYY-MM-DD"}
+        return func.to_char(local, formats[name]).label(name)
+    if dialect == "sqlite":
+        # SQLite stores the local time
+        if name == "week":
+            return func.date(Transaction.date, "weekday 0", "-6 days").label(name)
+        formats = {"year": "%Y", "month": "%Y-%m"}
+        return func.strftime(formats[name], Transaction.date).label(name)
+
+    raise click.UsageError(f"--group-by {name} is not supported on {dialect}")
+
+
+def aggregate_column(name: str):
+    """Aggregate of the amount labeled with its name"""
+    if name == "count":
+        return func.count(Transaction.id).label(name)
+    return getattr(func, name)(Transaction.amount).label(name)
+
+
+def write_rows(rows, headers: list[str], output_format: str) -> int:
+    """Print dict rows, ndjson and csv rows are written as they come
+
+    Returns
+    -------
+        Number of rows
+    """
+    n_rows = 0
+    if output_format == "ndjson":
+        for row in rows:
+            sys.stdout.write(json.dumps(row) + "\n")
+            n_rows += 1
+    elif output_format == "csv":
+        writer = csv.DictWriter(sys.stdout, fieldnames=headers)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            n_rows += 1
     else:
-        headers = [
-            "id",
-            "date",
-            "description",
-            "category",
-            "subcategory",
-            "amount",
-            "account",
-            "notes",
-        ]
-        table_data = [[row[h] for h in headers] for row in rows]
-        print(tabulate(table_data, headers=headers, tablefmt="simple", floatfmt=",.2f"))
-
-    logger.info(f"Found {len(results)} transaction(s)")
-    session.close()
+        rows = list(rows)
+        n_rows = len(rows)
+        if not rows:
+            return 0
+        if output_format == "json":
+            print(json.dumps(rows, indent=2))
+        else:
+            table_data = [[row[h] for h in headers] for row in rows]
+            print(
+                tabulate(
+                    table_data, headers=headers, tablefmt="simple", floatfmt=",.2f"
+                )
+            )
+    return n_rows
+
+
+HEADERS = [
+    "id",
+    "date",
+    "description",
+    "category",
+    "subcategory",
+    "amount",
+    "account",
+    "notes",
+]
+
+
+def format_row(result) -> dict:
+    """Output dict of a result row"""
+    date_str = result.date.strftime("%Y-%m-%d") if result.date else ""
+    return {
+        "id": result.id,
+        "date": date_str,
+        "description": result.description or "",
+        "category": result.category or "",
+        "subcategory": result.subcategory or "",
+        "amount": result.amount,
+        "account": result.account or "",
+        "notes": result.notes or "",
+    }
+
+
+def keyset_filter(column, value, last_id, desc: bool, nulls_high: bool):
+    """WHERE clause for the rows after (value, last_id) in ORDER BY column, id
+
+    NULLs are sorted as the DB does: after every value on PostgreSQL
+    (`nulls_high`) and before on SQLite, so the ORDER BY can use the indexes.
+    """
+    after = (lambda a, b: a < b) if desc else (lambda a, b: a > b)
+    # NULLs come after the non NULL values in this direction
+    nulls_after = nulls_high != desc
+
+    if value is None:
+        if nulls_after:
+            return and_(column.is_(None), after(Transaction.id, last_id))
+        return or_(column.isnot(None), after(Transaction.id, last_id))
+
+    clause = or_(
+        after(column, value),
+        and_(column == value, after(Transaction.id, last_id)),
+    )
+    if nulls_after:
+        clause = or_(clause, column.is_(None))
+    return clause
+
+
+def query_digest(**params) -> str:
+    """Short hash of the search parameters"""
+    data = json.dumps(params, sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(last, query_id: str) -> str:
+    """Token for the page after `last` (sort value, id)"""
+    value, last_id = last
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    data = json.dumps({"q": query_id, "v": value, "id": last_id})
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(token: str, query_id: str):
+    """(sort value, id) of a cursor token"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        value, last_id, cursor_query = data["v"], data["id"], data["q"]
+    except (ValueError, KeyError, TypeError):
+        raise click.BadParameter("Invalid cursor", param_hint="--cursor")
+
+    if cursor_query != query_id:
+        raise click.BadParameter(
+            "The cursor is from a search with different filters or sort",
+            param_hint="--cursor",
+        )
+    return value, last_id
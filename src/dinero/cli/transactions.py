@@ -15,14 +15,66 @@ ADD_PENDING = False
 
 
 @click.command()
-def transactions():
+@click.option(
+    "--insert",
+    "insert_mode",
+    type=click.Choice(["orm", "upsert", "bulk"]),
+    default="orm",
+    show_default=True,
+    help="How to insert new records: ORM, ON CONFLICT DO NOTHING or COPY/executemany.",
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="Institutions downloaded in parallel. Default: plaid.workers on the config.",
+)
+@click.option(
+    "--sync",
+    "incremental",
+    is_flag=True,
+    default=False,
+    help="Only fetch the changes since the last --sync run using Plaid sync cursors.",
+)
+@click.option(
+    "--cache",
+    "use_cache",
+    is_flag=True,
+    default=False,
+    help="Save the raw Plaid pages on the cache dir and reuse them until they expire.",
+)
+@click.option(
+    "--replay",
+    is_flag=True,
+    default=False,
+    help="Don't use the network, rebuild the transactions from the cached pages.",
+)
+def transactions(insert_mode, workers, incremental, use_cache, replay):
     """Fetch new transactions from Plaid and insert into the database."""
     app = Application()
 
+    if incremental:
+        sync(app, insert_mode=insert_mode, workers=workers)
+        return
+
+    cache = None
+    if use_cache or replay:
+        cache = plaid.ResponseCache(
+            app.cache_dir / "plaid", ttl=app.config.plaid.cache_ttl
+        )
+        if not replay:
+            cache.evict()
+
     # Get new transactions from plaid
-    all_transactions = plaid.get_all_transactions(app, date=DATE, days=DAYS)
+    all_transactions = plaid.get_all_transactions(
+        app, date=DATE, days=DAYS, workers=workers, cache=cache, replay=replay
+    )
+    if plaid.CLIENT is not None:
+        plaid.CLIENT.log_metrics()
 
-    table = db.Table(app)
+    # Load only the existing records in the date range of the downloaded ones
+    table = db.Table(app, window=True)
+    table.load_window(all_transactions)
 
     # Print individual accounts
     groups = all_transactions.group_by_account()
@@ -72,12 +124,14 @@ def transactions():
     print("All accounts summary from {} to {}:".format(start_date, end_date))
     print("=" * 80)
     print("Using Table for year: {}".format(DATE.year))
-    print("Records in table: {}".format(len_table))
+    print("Records loaded from table: {}".format(len_table))
     print("Transactions queried: {}".format(n_transactions))
     print("Pending transactions: {}".format(n_pending))
     print("Transactions analysed (pending {}): {}".format(ADD_PENDING, n_records))
     print("New records to be inserted: {}".format(n_new))
     print("Existing transactions: {}".format(n_existing))
+    for name, error in all_transactions.errors.items():
+        print("Failed institution {}: {}".format(name, error))
     print()
 
     assert n_records == n_new + n_existing
@@ -86,5 +140,110 @@ def transactions():
         "Insert transactions to the Table?"
     ):
         print("Inserting %i new records" % len(table.new))
-        table.commit()
-        print("Done")
+        inserted, skipped = table.commit(mode=insert_mode)
+        print("Done. Inserted: {} Skipped: {}".format(inserted, skipped))
+
+
+def sync(app: Application, insert_mode="orm", workers=None):
+    """Apply the transactions added, modified and removed since the last sync
+
+    Cursors are saved on `plaid_sync.json` in the config directory, only
+    after the changes are committed. Modified and removed transactions are
+    found on the DB by their Plaid id so the cost depends on the number of
+    changes. The first sync of an institution gets all its history.
+    """
+    state = plaid.SyncState(app.config_dir / "plaid_sync.json")
+    # One client for all the threads so they share its rate limit
+    client = plaid.get_client(app)
+
+    results = plaid.for_each_institution(
+        app,
+        lambda name: plaid.sync_transactions(
+            app, name, cursor=state.cursor(name), client=client
+        ),
+        workers=workers,
+    )
+    client.log_metrics()
+    deltas = [delta for _, delta, error in results if error is None]
+
+    table = db.Table(app, window=True)
+
+    # Plaid ids saved on the sync state file by older versions
+    legacy_keys = state.pop_legacy_keys()
+    if legacy_keys:
+        n_rows = table.set_plaid_ids(legacy_keys)
+        logger.bind(records=n_rows).info("Saved the Plaid ids of synced records")
+
+    modified = [
+        transaction for delta in deltas for transaction in delta.modified.not_pending
+    ]
+    removed_ids = [
+        transaction_id for delta in deltas for transaction_id in delta.removed
+    ]
+    known_ids = table.existing_plaid_ids(
+        [transaction.transaction_id for transaction in modified] + removed_ids
+    )
+
+    added = plaid.TransactionList()
+    added.app = app
+    changes = []
+    for delta in deltas:
+        added.extend(delta.added.not_pending)
+    for transaction in modified:
+        if transaction.transaction_id in known_ids:
+            record = db.Transaction.from_plaid(app, transaction, categories=("", ""))
+            changes.append((transaction.transaction_id, record))
+        else:
+            # Not inserted before, for example it was pending
+            added.append(transaction)
+    removed = [
+        transaction_id for transaction_id in removed_ids if transaction_id in known_ids
+    ]
+
+    new, existing = table.prepare(added)
+
+    for transaction in new:
+        logger.info("Transaction", transaction=transaction)
+
+    print("=" * 80)
+    print("Incremental sync summary:")
+    print("=" * 80)
+    print("Institutions synced: {}".format(len(deltas)))
+    print("Transactions added (not pending): {}".format(len(added)))
+    print("New records to be inserted: {}".format(len(new)))
+    print("Existing transactions: {}".format(len(existing)))
+    print("Records to be updated: {}".format(len(changes)))
+    print("Records to be deleted: {}".format(len(removed)))
+    for name, _, error in results:
+        if error is not None:
+            print("Failed institution {}: {}".format(name, error))
+    print()
+
+    if not deltas:
+        return
+
+    if utils.noninteractive() or utils.query_yes_no("Apply changes to the Table?"):
+        inserted, skipped = table.commit(mode=insert_mode)
+        updated = table.update(changes)
+        deleted = table.delete(removed)
+        # Existing records inserted without a Plaid id, by a CSV import or
+        # before the plaid_id column, so their next changes are found
+        table.set_plaid_ids(
+            [
+                (record.plaid_id, record.dedup_key(app.config.timezone))
+                for record in existing
+                if record.plaid_id
+            ]
+        )
+        print(
+            "Done. Inserted: {} Skipped: {} Updated: {} Deleted: {}".format(
+                inserted, skipped, updated, deleted
+            )
+        )
+
+        for delta in deltas:
+            state.set_cursor(delta.name, delta.cursor)
+        state.save()
+    elif legacy_keys:
+        # The Plaid ids are on the DB already
+        state.save()
@@ -11,14 +11,49 @@ class Plaid(BaseModel):
     tokens: Dict[str, str]
     account_id_to_name: Dict[str, str]
 
+    # Institutions downloaded in parallel
+    workers: int = 4
+    # Pages of one institution downloaded in parallel
+    page_workers: int = 4
+    # Seconds the raw Plaid pages are kept on the cache (transactions --cache)
+    cache_ttl: int = 86400
+
+    # API calls per second and max burst, shared by all the threads
+    rate_limit: float = 5.0
+    rate_burst: int = 10
+    # Retries of transient errors with exponential backoff (seconds)
+    max_retries: int = 5
+    backoff: float = 1.0
+    max_backoff: float = 30.0
+
 
 class Database(BaseModel):
     connection_string: str
 
+    # Connection pool of the shared engine
+    pool_size: int = 5
+    pool_pre_ping: bool = True
+    pool_recycle: int = 3600  # Seconds
+
+    # Days added around the dates of new records when loading existing ones
+    window_slack_days: int = 3
+
+
+class Search(BaseModel):
+    # Results of `dinero search` are cached until rows are written by dinero,
+    # off by default: changes made outside dinero (e.g. editing categories
+    # on the DB) are not detected
+    cache: bool = False
+    cache_max_mb: int = 64
+    cache_max_entries: int = 1000
+    # Searches with a bigger --limit are not cached
+    cache_max_rows: int = 10000
+
 
 class RootConfig(BaseSettings):
     plaid: Plaid
     database: Database
+    search: Search = Search()
 
     timezone: str = "US/Central"
 
@@ -1,38 +1,118 @@
 import datetime
+import functools
+import time
 
-from numpy import select
+import pendulum
 from loguru import logger
-from sqlalchemy import DateTime, Double, String, create_engine, select
+from sqlalchemy import (
+    DateTime,
+    Double,
+    Index,
+    String,
+    column,
+    delete,
+    func,
+    insert,
+    inspect,
+    literal_column,
+    select,
+    table,
+    text,
+    update,
+)
+from sqlalchemy.exc import DBAPIError, OperationalError, ProgrammingError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker
+from sqlalchemy.sql.expression import ClauseElement, Executable
 
-from dinero import rules
 from dinero.application import Application
+from dinero.ledger import Ledger, dedup_key
+from dinero.search_cache import mark_table_changed
 
 
 class Table:
-    def __init__(self, app: Application):
+    def __init__(self, app: Application, window=False, slack_days=None):
+        """
+        Parameters
+        ----------
+            window: If True, don't load the whole table. Only the existing
+                records in the date range of the records passed to `prepare()`
+                are loaded (see `load_window()`)
+            slack_days: Days added to each side of the date range in window
+                mode. Defaults to `database.window_slack_days` on the config
+        """
         self.app = app
         self.session = get_session(app)
+        self.window = window
+        if slack_days is None:
+            slack_days = app.config.database.window_slack_days
+        self.slack_days = slack_days
 
         # Internal state
-        self.records = []
+        self.ledger = Ledger()  # Dedup keys of every loaded record
+        self.loaded_range = None  # (start, end) loaded in window mode
         self.new = []
         self.existing = []
         self.errored = []
 
-        self.load()
+        if not self.window:
+            self.load()
 
     def __repr__(self):
-        return "Transactions: {}".format(len(self.records))
+        return "Transactions: {}".format(len(self.ledger))
 
     def __len__(self):
-        return len(self.records)
+        return len(self.ledger)
 
-    def load(self):
-        stmt = select(Transaction)
+    def load(self, start=None, end=None):
+        """Load existing records, optionally only the ones in [start, end)
+        Only the dedup columns are loaded into `self.ledger`
+        """
+        load_ledger(
+            self.session,
+            start,
+            end,
+            ledger=self.ledger,
+            timezone=self.app.config.timezone,
+        )
+
+    def load_window(self, records):
+        """Load the existing records in the date range of `records`
 
-        for transaction in self.session.scalars(stmt):
-            self.records.append(transaction)
+        The range goes from the first to the last date of `records` plus
+        `slack_days` on each side. If part of the range was already loaded
+        only the missing part is queried.
+        Does nothing if the Table is not in window mode.
+
+        Parameters
+        ----------
+            records: Any list of objects with a `date` attribute
+        """
+        if not self.window:
+            return
+
+        dates = [record.date for record in records if record.date is not None]
+        if not dates:
+            return
+
+        slack = datetime.timedelta(days=self.slack_days)
+        start = min(dates) - slack
+        end = max(dates) + slack + datetime.timedelta(days=1)
+
+        if self.loaded_range is None:
+            self.load(start, end)
+            self.loaded_range = (start, end)
+            return
+
+        loaded_start, loaded_end = self.loaded_range
+        if start < loaded_start:
+            self.load(start, loaded_start)
+            loaded_start = start
+        if end > loaded_end:
+            self.load(loaded_end, end)
+            loaded_end = end
+        self.loaded_range = (loaded_start, loaded_end)
 
     def prepare(self, transactions):
         """
@@ -48,18 +128,13 @@ class Table:
         -------
             (existing, new, error): tuple of 3 lists, each list are Record
         """
-        new_records = [Transaction.from_plaid(self.app, tr) for tr in transactions]
-
-        self.new, self.existing = [], []
-
-        for record in new_records:
-            if not self.exists(record):
-                self.new.append(record)
-            else:
-                self.existing.append(record)
-            # break
-
-        return self.new, self.existing
+        descriptions = [tr.name for tr in transactions]
+        categories = self.app.rules.categorize_batch(descriptions)
+        new_records = [
+            Transaction.from_plaid(self.app, tr, categories=categories_)
+            for tr, categories_ in zip(transactions, categories)
+        ]
+        return self.prepare_from_records(new_records)
 
     def prepare_from_records(self, records: list["Transaction"]):
         """
@@ -72,45 +147,660 @@ class Table:
         ----------
             records: List of Transaction objects to (possibly) be inserted
 
+        Records that are duplicated inside `records` itself are only counted
+        as new once, the rest are returned as existing.
+
         Returns
         -------
             (new, existing): tuple of 2 lists of Transaction objects
         """
+        self.load_window(records)
+
         self.new, self.existing = [], []
+        seen = set()
 
         for record in records:
-            if not self.exists(record):
-                self.new.append(record)
-            else:
+            key = record.dedup_key(self.app.config.timezone)
+            if key in self.ledger or key in seen:
                 self.existing.append(record)
+            else:
+                self.new.append(record)
+                seen.add(key)
 
         return self.new, self.existing
 
-    def commit(self, *args, **kwargs):
-        """Commit changes to Postgres
+    def commit(self, mode="orm"):
+        """Commit changes to the DB
         Run `self.prepare(records)` first
+
+        Parameters
+        ----------
+            mode: How to insert the new records
+                - orm: `session.add_all()`
+                - upsert: `self.upsert()`, records that already exist on
+                  the DB are skipped by the DB
+                - bulk: `self.bulk_load()`, COPY on PostgreSQL
+
+        Returns
+        -------
+            (inserted, skipped): number of records
+        """
+        start = time.perf_counter()
+
+        if mode == "orm":
+            self.session.add_all(self.new)
+            self.session.commit()
+            inserted, skipped = len(self.new), 0
+            self._changed(inserted)
+        elif mode == "upsert":
+            inserted, skipped = self.upsert(self.new)
+        elif mode == "bulk":
+            inserted, skipped = self.bulk_load(self.new)
+        else:
+            raise ValueError(f"Invalid commit mode: {mode}")
+
+        elapsed = time.perf_counter() - start
+        rows_per_second = round(len(self.new) / elapsed) if elapsed else 0
+        logger.bind(
+            mode=mode,
+            records=len(self.new),
+            seconds=round(elapsed, 3),
+            rows_per_second=rows_per_second,
+        ).info("Committed records")
+        return inserted, skipped
+
+    def upsert(self, records: list["Transaction"]):
+        """Insert records in one `INSERT ... ON CONFLICT DO NOTHING` statement
+
+        Duplicates are detected by the unique index created by
+        `create_dedup_index()` so records don't need to be loaded or prepared
+        first. Fails with a RuntimeError if the index doesn't exist.
+        Only PostgreSQL and SQLite are supported.
+
+        Returns
+        -------
+            (inserted, skipped): number of records as reported by the DB
+        """
+        if not records:
+            return 0, 0
+
+        dialect = self.session.get_bind().dialect.name
+        if dialect == "postgresql":
+            insert = postgresql.insert
+        elif dialect == "sqlite":
+            insert = sqlite.insert
+        else:
+            raise NotImplementedError(f"Upsert not supported for: {dialect}")
+
+        # Without the unique index nothing conflicts and every record is
+        # inserted, duplicates included
+        if not index_exists(self.session.get_bind(), DEDUP_INDEX):
+            raise RuntimeError(
+                f"Upsert requires the unique index {DEDUP_INDEX}, "
+                "run `dinero db-indexes` to create it"
+            )
+
+        stmt = insert(Transaction).on_conflict_do_nothing()
+        stmt = stmt.returning(Transaction.id)
+        rows = [record.to_row() for record in records]
+
+        inserted = len(self.session.scalars(stmt, rows).all())
+        self.session.commit()
+        self._changed(inserted)
+
+        skipped = len(records) - inserted
+        logger.bind(inserted=inserted, skipped=skipped).info("Upserted records")
+        return inserted, skipped
+
+    def bulk_load(self, records: list["Transaction"]):
+        """Insert records in bulk
+
+        On PostgreSQL the records are streamed with `COPY ... FROM STDIN` into
+        a temporary staging table and merged with a single
+        `INSERT ... SELECT ... ON CONFLICT DO NOTHING`.
+        Other DBs use `executemany` with SQLAlchemy's insertmanyvalues batching,
+        also with `ON CONFLICT DO NOTHING` on SQLite, so records that already
+        exist are counted as skipped on both.
+
+        Returns
+        -------
+            (inserted, skipped): number of records
+        """
+        if not records:
+            return 0, 0
+
+        columns = [c.key for c in Transaction.__table__.columns if c.key != "id"]
+        rows = [record.to_row() for record in records]
+        dialect = self.session.get_bind().dialect
+
+        # Existing records are skipped like on the COPY merge
+        if dialect.name == "postgresql":
+            stmt = postgresql.insert(Transaction).on_conflict_do_nothing()
+        elif dialect.name == "sqlite":
+            stmt = sqlite.insert(Transaction).on_conflict_do_nothing()
+        else:
+            stmt = insert(Transaction)
+
+        if dialect.name == "postgresql" and dialect.driver == "psycopg":
+            inserted = self._copy_rows(columns, rows)
+        elif dialect.insert_executemany_returning:
+            stmt = stmt.returning(Transaction.id)
+            inserted = len(self.session.scalars(stmt, rows).all())
+        else:
+            self.session.execute(stmt, rows)
+            inserted = len(rows)
+        self.session.commit()
+        self._changed(inserted)
+
+        return inserted, len(records) - inserted
+
+    def _copy_rows(self, columns: list[str], rows: list[dict]) -> int:
+        """COPY rows into a staging table and merge them into the table.
+        Runs on the session transaction, the staging table is dropped on commit.
+        """
+        table = Transaction.__tablename__
+        staging = f"{table}_staging"
+        column_list = ", ".join(columns)
+
+        # psycopg connection used by the session
+        connection = self.session.connection().connection.driver_connection
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+                f"SELECT {column_list} FROM {table} WITH NO DATA"
+            )
+            with cursor.copy(f"COPY {staging} ({column_list}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row([row[column] for column in columns])
+            cursor.execute(
+                f"INSERT INTO {table} ({column_list}) "
+                f"SELECT {column_list} FROM {staging} ON CONFLICT DO NOTHING"
+            )
+            return cursor.rowcount
+
+    def update(self, changes):
+        """Update the DB rows with a Plaid transaction id with new values
+        Category, subcategory and notes of the rows are kept
+
+        Parameters
+        ----------
+            changes: List of (Plaid transaction id, Transaction with the new
+                values)
+
+        Returns
+        -------
+            Number of updated rows
+        """
+        updated = 0
+        for plaid_id, record in changes:
+            stmt = (
+                update(Transaction)
+                .where(Transaction.plaid_id == plaid_id)
+                .values(
+                    date=record.date,
+                    description=record.description,
+                    amount=record.amount,
+                    account=record.account,
+                )
+            )
+            updated += self.session.execute(stmt).rowcount
+        self.session.commit()
+        self._changed(updated)
+        return updated
+
+    def delete(self, plaid_ids):
+        """Delete the DB rows with the Plaid transaction ids
+
+        Returns
+        -------
+            Number of deleted rows
+        """
+        deleted = 0
+        for chunk in _chunks(plaid_ids, IN_CHUNK_SIZE):
+            stmt = delete(Transaction).where(Transaction.plaid_id.in_(chunk))
+            deleted += self.session.execute(stmt).rowcount
+        self.session.commit()
+        self._changed(deleted)
+        return deleted
+
+    def existing_plaid_ids(self, plaid_ids) -> set[str]:
+        """Plaid transaction ids that are on the DB, uses the plaid_id index"""
+        existing = set()
+        for chunk in _chunks(plaid_ids, IN_CHUNK_SIZE):
+            stmt = select(Transaction.plaid_id).where(Transaction.plaid_id.in_(chunk))
+            existing.update(self.session.scalars(stmt))
+        return existing
+
+    def set_plaid_ids(self, items):
+        """Save the Plaid transaction id of rows inserted without one
+
+        Parameters
+        ----------
+            items: List of (Plaid transaction id, dedup key of the row)
+
+        Returns
+        -------
+            Number of updated rows
         """
-        self.session.add_all(self.new)
+        updated = 0
+        for plaid_id, key in items:
+            stmt = (
+                update(Transaction)
+                .where(*self._key_filter(key), Transaction.plaid_id.is_(None))
+                .values(plaid_id=plaid_id)
+            )
+            updated += self.session.execute(stmt).rowcount
         self.session.commit()
+        self._changed(updated)
+        return updated
+
+    def _changed(self, n_rows):
+        """Invalidate the cached search results if rows were written"""
+        if n_rows:
+            mark_table_changed(self.app)
+
+    def _key_filter(self, key):
+        """WHERE clauses for the rows of a dedup key"""
+        day, account, description, amount = key
+        date = datetime.date.fromordinal(day)
+        start = pendulum.datetime(
+            date.year, date.month, date.day, tz=self.app.config.timezone
+        )
+        return (
+            Transaction.date >= start,
+            Transaction.date < start.add(days=1),
+            Transaction.account == account,
+            Transaction.description == description,
+            Transaction.amount == amount,
+        )
 
     def exists(self, new):
         """Check if the record exists"""
-        for existing in self.records:
-            if existing == new:
-                return True
-        return False
+        return new.dedup_key(self.app.config.timezone) in self.ledger
 
     def close(self):
         self.session.close()
 
 
-def get_session(app: Application):
-    engine = create_engine(app.config.database.connection_string)
+DEDUP_INDEX = "ix_transactions_dedup"
+
+# Values per `IN (...)` clause
+IN_CHUNK_SIZE = 1000
+
+
+def _chunks(values, size):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i : i + size]
+
+
+def create_dedup_index(app: Application, engine):
+    """Create the unique index on (day, account, description, amount)
+
+    The day is computed on the configured timezone so it matches
+    `Transaction.dedup_key()`. Fails with an IntegrityError if the table
+    already has duplicated records.
+    """
+    if engine.dialect.name == "postgresql":
+        timezone = app.config.timezone.replace("'", "''")
+        day = f"((date AT TIME ZONE '{timezone}')::date)"
+    elif engine.dialect.name == "sqlite":
+        day = "date(date)"
+    else:
+        raise NotImplementedError(
+            f"Dedup index not supported for: {engine.dialect.name}"
+        )
+
+    ddl = (
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {DEDUP_INDEX} "
+        f"ON {Transaction.__tablename__} ({day}, account, description, amount)"
+    )
+    with engine.begin() as conn:
+        conn.execute(text(ddl))
+
+
+# pg_trgm GIN index on PostgreSQL, FTS5 table on SQLite
+SEARCH_INDEX = "ix_transactions_description_trgm"
+SEARCH_TABLE = "transactions_fts"
+
+# FTS5 external content table with the trigram tokenizer, kept in sync
+# with the transactions table by triggers
+SQLITE_SEARCH_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        description, content='transactions', content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert
+    AFTER INSERT ON transactions BEGIN
+        INSERT INTO {SEARCH_TABLE} (rowid, description)
+        VALUES (new.id, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete
+    AFTER DELETE ON transactions BEGIN
+        INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, description)
+        VALUES ('delete', old.id, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update
+    AFTER UPDATE OF description ON transactions BEGIN
+        INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, description)
+        VALUES ('delete', old.id, old.description);
+        INSERT INTO {SEARCH_TABLE} (rowid, description)
+        VALUES (new.id, new.description);
+    END
+    """,
+    f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('rebuild')",
+]
+
+# Shortest term the trigram indexes can match
+MIN_TRIGRAM_TERM = 3
+
+
+def create_search_index(engine):
+    """Create the description search index
+
+    - PostgreSQL: `pg_trgm` extension and a GIN index on description
+    - SQLite: FTS5 table with the trigram tokenizer, filled with the
+      existing records and kept in sync with triggers
+    """
+    if engine.dialect.name == "postgresql":
+        ddl = [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            f"CREATE INDEX IF NOT EXISTS {SEARCH_INDEX} ON {Transaction.__tablename__} "
+            "USING gin (description gin_trgm_ops)",
+        ]
+    elif engine.dialect.name == "sqlite":
+        ddl = SQLITE_SEARCH_DDL
+    else:
+        raise NotImplementedError(
+            f"Search index not supported for: {engine.dialect.name}"
+        )
+
+    with engine.begin() as conn:
+        for statement in ddl:
+            conn.execute(text(statement))
+
+
+def search_index_name(engine) -> str | None:
+    """Name of the search index or FTS table, None if not supported"""
+    return {"postgresql": SEARCH_INDEX, "sqlite": SEARCH_TABLE}.get(
+        engine.dialect.name
+    )
+
+
+def search_index_exists(engine) -> bool:
+    if engine.dialect.name == "sqlite":
+        query = text(
+            "SELECT COUNT(*) > 0 FROM sqlite_master "
+            "WHERE type = 'table' AND name = :name"
+        )
+        with engine.connect() as conn:
+            return bool(conn.execute(query, {"name": SEARCH_TABLE}).scalar())
+    return index_exists(engine, SEARCH_INDEX)
+
+
+def search_description(stmt, engine, query: str, use_index=True):
+    """Filter a select of Transactions by the terms of `query`
+
+    Every term has to be part of the description, case-insensitive, so
+    terms also match the start of words. The search index is used if it
+    exists, otherwise each term is an ILIKE.
+
+    Returns
+    -------
+        (stmt, score): score is a column expression where higher is a
+            better match or None if the DB can't rank the results
+    """
+    terms = query.split()
+    if not terms:
+        return stmt, None
+
+    dialect = engine.dialect.name
+    if not (use_index and dialect in ("postgresql", "sqlite")):
+        return stmt.where(*[_contains(term) for term in terms]), None
+    if not search_index_exists(engine):
+        logger.warning("No search index, run `dinero db-indexes` to create it")
+        return stmt.where(*[_contains(term) for term in terms]), None
+
+    if dialect == "postgresql":
+        # ILIKE uses the GIN trigram index
+        stmt = stmt.where(*[_contains(term) for term in terms])
+        return stmt, func.word_similarity(query, Transaction.description)
+
+    # SQLite: the trigram tokenizer doesn't match terms with less than 3
+    # characters, those are filtered with LIKE on the matched rows
+    long_terms = [term for term in terms if len(term) >= MIN_TRIGRAM_TERM]
+    short_terms = [term for term in terms if len(term) < MIN_TRIGRAM_TERM]
+    stmt = stmt.where(*[_contains(term) for term in short_terms])
+    if not long_terms:
+        return stmt, None
+
+    fts = table(SEARCH_TABLE, column("rowid"), column("rank"))
+    match = " AND ".join('"{}"'.format(term.replace('"', '""')) for term in long_terms)
+    stmt = stmt.join(fts, fts.c.rowid == Transaction.id).where(
+        literal_column(SEARCH_TABLE).match(match)
+    )
+    # bm25() is lower for better matches
+    return stmt, -fts.c.rank
+
+
+def _contains(term: str):
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return Transaction.description.ilike(f"%{escaped}%", escape="\\")
+
+
+def add_missing_columns(engine) -> list[str]:
+    """Add the columns of the model that the transactions table doesn't have
+    `create_all()` only creates missing tables, this upgrades existing ones
+
+    Returns
+    -------
+        Names of the added columns
+    """
+    table = Transaction.__tablename__
+    existing = {column["name"] for column in inspect(engine).get_columns(table)}
+
+    added = []
+    with engine.begin() as conn:
+        for column in Transaction.__table__.columns:
+            if column.name in existing:
+                continue
+            type_ = column.type.compile(dialect=engine.dialect)
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column.name} {type_}"))
+            added.append(column.name)
+    return added
+
+
+def create_indexes(app: Application, engine) -> tuple[list[str], dict]:
+    """Create the indexes declared on the model, the dedup index and the
+    search index that don't exist on the DB yet
+
+    Each index is created on its own so one that fails, like the dedup
+    index on a table with duplicated records or the search index on a
+    PostgreSQL without the `pg_trgm` extension, doesn't stop the others.
+
+    Returns
+    -------
+        (created, failed): Names of the created indexes and
+            {name: exception} of the ones that could not be created
+    """
+    pending = [
+        (index.name, functools.partial(index.create, engine))
+        for index in sorted(Transaction.__table__.indexes, key=lambda i: i.name)
+        if not index_exists(engine, index.name)
+    ]
+    if not index_exists(engine, DEDUP_INDEX):
+        create = functools.partial(create_dedup_index, app, engine)
+        pending.append((DEDUP_INDEX, create))
+    search_index = search_index_name(engine)
+    if search_index and not search_index_exists(engine):
+        pending.append((search_index, functools.partial(create_search_index, engine)))
+
+    created, failed = [], {}
+    for name, create in pending:
+        try:
+            create()
+        except DBAPIError as e:
+            failed[name] = e
+        else:
+            created.append(name)
+    return created, failed
+
+
+def index_exists(engine, name: str) -> bool:
+    """Check the DB catalog for an index, including expression indexes"""
+    if engine.dialect.name == "postgresql":
+        query = text("SELECT to_regclass(:name) IS NOT NULL")
+    elif engine.dialect.name == "sqlite":
+        query = text(
+            "SELECT COUNT(*) > 0 FROM sqlite_master "
+            "WHERE type = 'index' AND name = :name"
+        )
+    else:
+        return inspect(engine).has_index(Transaction.__tablename__, name)
+
+    with engine.connect() as conn:
+        return bool(conn.execute(query, {"name": name}).scalar())
+
+
+def index_sizes(engine) -> dict[str, int | None]:
+    """Size in bytes of each index of the transactions table
+    None when the DB doesn't report it (SQLite without the dbstat table)
+    """
+    names = sorted(index.name for index in Transaction.__table__.indexes)
+    names.append(DEDUP_INDEX)
+    if search_index_name(engine):
+        names.append(search_index_name(engine))
+
+    if engine.dialect.name == "postgresql":
+        query = text("SELECT pg_relation_size(to_regclass(:name))")
+    elif engine.dialect.name == "sqlite":
+        # FTS5 data is in the shadow tables: <name>_data, <name>_idx, ...
+        query = text(
+            "SELECT SUM(pgsize) FROM dbstat "
+            "WHERE name = :name OR name GLOB :name || '_*'"
+        )
+    else:
+        return {name: None for name in names}
+
+    sizes = {}
+    with engine.connect() as conn:
+        for name in names:
+            try:
+                sizes[name] = conn.execute(query, {"name": name}).scalar()
+            except OperationalError:
+                sizes[name] = None
+    return sizes
 
-    Session = sessionmaker(bind=engine)
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN of a statement, the bind parameters are passed as usual
+
+    - PostgreSQL: `EXPLAIN (ANALYZE, BUFFERS)` with `analyze=True`, the
+      statement is executed
+    - SQLite: `EXPLAIN QUERY PLAN`
+    """
+
+    inherit_cache = False
+
+    def __init__(self, statement, analyze=False):
+        self.statement = statement
+        self.analyze = analyze
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN " + compiler.process(element.statement, **kw)
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain_postgresql(element, compiler, **kw):
+    options = "(ANALYZE, BUFFERS) " if element.analyze else ""
+    return f"EXPLAIN {options}" + compiler.process(element.statement, **kw)
+
+
+@compiles(Explain, "sqlite")
+def _compile_explain_sqlite(element, compiler, **kw):
+    return "EXPLAIN QUERY PLAN " + compiler.process(element.statement, **kw)
+
+
+def explain(session, stmt, analyze=False) -> list[str]:
+    """Query plan of a statement as lines of text"""
+    dialect = session.get_bind().dialect.name
+    rows = session.execute(Explain(stmt, analyze=analyze)).all()
+
+    if dialect == "sqlite":
+        # (id, parent, notused, detail) rows of a tree
+        depth = {0: 0}
+        lines = []
+        for id_, parent, _, detail in rows:
+            depth[id_] = depth.get(parent, 0) + 1
+            lines.append("  " * (depth[id_] - 1) + detail)
+        return lines
+    return [str(row[0]) for row in rows]
+
+
+def load_ledger(session, start=None, end=None, ledger=None, timezone=None) -> Ledger:
+    """Load the dedup columns of the records in [start, end) into a Ledger
+
+    Parameters
+    ----------
+        ledger: Add the records to an existing Ledger instead of a new one
+        timezone: Timezone of the dedup days, see `ledger.dedup_key()`
+    """
+    ledger = Ledger() if ledger is None else ledger
+
+    stmt = select(
+        Transaction.date,
+        Transaction.account,
+        Transaction.description,
+        Transaction.amount,
+    )
+    if start is not None:
+        stmt = stmt.where(Transaction.date >= start)
+    if end is not None:
+        stmt = stmt.where(Transaction.date < end)
+
+    for row in session.execute(stmt.execution_options(yield_per=10_000)):
+        ledger.add(dedup_key(*row, timezone=timezone))
+    return ledger
+
+
+def get_session(app: Application):
+    upgrade_table(app.engine)
+    Session = sessionmaker(bind=app.engine)
     return Session()
 
 
+# Engines already checked by `upgrade_table()`
+_UPGRADED_ENGINES = set()
+
+
+def upgrade_table(engine):
+    """Add the columns that tables created by older versions don't have
+    Runs once per engine, the first time a session is created
+    """
+    if engine in _UPGRADED_ENGINES:
+        return
+    if inspect(engine).has_table(Transaction.__tablename__):
+        try:
+            added = add_missing_columns(engine)
+        except (OperationalError, ProgrammingError) as e:
+            raise RuntimeError(
+                "The transactions table is missing columns and they could not "
+                f"be added, run `dinero db-indexes`: {e}"
+            ) from e
+        for name in added:
+            logger.bind(column=name).warning("Added column to the transactions table")
+    _UPGRADED_ENGINES.add(engine)
+
+
 class Base(DeclarativeBase):
     pass
 
@@ -125,6 +815,12 @@ class Transaction(Base):
     """
 
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index("ix_transactions_date", "date"),
+        Index("ix_transactions_account_date", "account", "date"),
+        Index("ix_transactions_category_subcategory", "category", "subcategory"),
+        Index("ix_transactions_plaid_id", "plaid_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     date: Mapped[datetime.date] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -134,35 +830,40 @@ class Transaction(Base):
     amount: Mapped[float] = mapped_column(Double(), nullable=True)
     notes: Mapped[str] = mapped_column(String(1000), nullable=True)
     account: Mapped[str] = mapped_column(String(50), nullable=True)
+    # Plaid transaction id, used to apply the changes of `transactions --sync`
+    plaid_id: Mapped[str] = mapped_column(String(100), nullable=True)
 
-    def __eq__(self, other_record):
-        # Checks uniqueness based on: Date, Account Name, Description, Amount
-        my_date = "%s-%02d-%02d" % (
-            self.date.year,
-            self.date.month,
-            self.date.day,
-        )
-        date = "%s-%02d-%02d" % (
-            other_record.date.year,
-            other_record.date.month,
-            other_record.date.day,
+    def dedup_key(self, timezone=None):
+        """Key used to check uniqueness, see `ledger.dedup_key()`
+        Compare records with the keys in `app.config.timezone`, records are
+        mutable so they don't define `==` and `hash()` on it
+        """
+        return dedup_key(
+            self.date, self.account, self.description, self.amount, timezone
         )
 
-        if (
-            my_date == date
-            and self.account == other_record.account
-            and self.description == other_record.description
-            and self.amount == other_record.amount
-        ):
-            return True
-        return False
+    def to_row(self):
+        """Column values as a dict, without the `id`, for bulk inserts"""
+        return {
+            column.key: getattr(self, column.key)
+            for column in self.__table__.columns
+            if column.key != "id"
+        }
 
     @classmethod
-    def from_plaid(cls, app: Application, plaid_transaction):
+    def from_plaid(cls, app: Application, plaid_transaction, categories=None):
+        """Create a record from a `plaid.Transaction`
+
+        Parameters
+        ----------
+            categories: (category, subcategory) if already computed,
+                if None they are looked up on `app.rules`
+        """
         new = cls()
         description = plaid_transaction.name
-        category, subcategory = "", ""
-        category, subcategory = rules.categories_for_transaction(app, description)
+        if categories is None:
+            categories = app.rules.categorize(description)
+        category, subcategory = categories
 
         new.date = plaid_transaction.date
         new.description = description
@@ -171,6 +872,7 @@ class Transaction(Base):
         new.amount = plaid_transaction.amount
         new.notes = "new"
         new.account = plaid_transaction.account_name
+        new.plaid_id = plaid_transaction.transaction_id or None
 
         return new
 
@@ -0,0 +1,143 @@
+"""Compact in-memory copy of the dedup columns of the transactions table
+
+Used by `db.Table` to check for existing records without loading ORM objects.
+"""
+
+import math
+from array import array
+
+import numpy as np
+import pandas as pd
+import pendulum
+
+
+# date.toordinal() of 1970-01-01
+EPOCH_ORDINAL = 719163
+
+
+def dedup_key(date, account, description, amount, timezone=None):
+    """Key used to check uniqueness: Date (day), Account Name, Description, Amount
+
+    The date is reduced to its day number so records created from Plaid,
+    CSV files or loaded from the DB compare equal regardless of the time.
+
+    Parameters
+    ----------
+        timezone: Timezone-aware dates are converted to it before taking
+            the day, so DB rows returned in the session timezone (UTC on
+            PostgreSQL) get the same day as the dedup index
+    """
+    if timezone is not None and getattr(date, "tzinfo", None) is not None:
+        date = pendulum.instance(date).in_tz(timezone)
+    day = date.toordinal() if date is not None else None
+    return (day, account, description, amount)
+
+
+class Ledger:
+    """Columnar set of dedup keys
+
+    Dates are stored as day numbers and accounts and descriptions as codes
+    into a list of their unique values, all in typed arrays.
+    Lookups go through a {hash(key): row} dict and are verified against
+    the columns.
+
+    Usage
+    -----
+        ledger = Ledger()
+        ledger.add(dedup_key(date, account, description, amount))
+        key in ledger
+    """
+
+    def __init__(self):
+        self.days = array("i")  # 0 when the date is None
+        self.amounts = array("d")  # NaN when the amount is None
+        self.account_codes = array("i")  # -1 when the value is None
+        self.description_codes = array("i")
+
+        self.accounts = []
+        self.descriptions = []
+        self._account_to_code = {}
+        self._description_to_code = {}
+
+        self._rows = {}  # {hash(key): row}
+        self._collisions = set()  # Keys with the same hash as a different key
+
+    def __len__(self):
+        return len(self.days)
+
+    def __repr__(self):
+        return "Ledger: {}".format(len(self))
+
+    def __contains__(self, key):
+        row = self._rows.get(hash(key))
+        if row is None:
+            return False
+        return self.key_at(row) == key or key in self._collisions
+
+    def add(self, key):
+        """Add a dedup key, does nothing if it already exists"""
+        if key in self:
+            return
+
+        day, account, description, amount = key
+        self.days.append(0 if day is None else day)
+        self.amounts.append(math.nan if amount is None else amount)
+        self.account_codes.append(
+            self._code(account, self.accounts, self._account_to_code)
+        )
+        self.description_codes.append(
+            self._code(description, self.descriptions, self._description_to_code)
+        )
+
+        hash_ = hash(key)
+        if hash_ in self._rows:
+            self._collisions.add(key)
+        else:
+            self._rows[hash_] = len(self) - 1
+
+    def key_at(self, row):
+        """Dedup key of a row"""
+        day = self.days[row]
+        amount = self.amounts[row]
+        account_code = self.account_codes[row]
+        description_code = self.description_codes[row]
+        return (
+            day or None,
+            None if account_code < 0 else self.accounts[account_code],
+            None if description_code < 0 else self.descriptions[description_code],
+            None if math.isnan(amount) else amount,
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """Columns as a pandas.DataFrame
+        Account and description are Categoricals
+        """
+        days = np.frombuffer(self.days, dtype=np.int32).astype(np.int64)
+        dates = pd.to_datetime(days - EPOCH_ORDINAL, unit="D")
+        dates = dates.where(days != 0)
+
+        return pd.DataFrame(
+            {
+                "date": dates,
+                "account": pd.Categorical.from_codes(
+                    np.frombuffer(self.account_codes, dtype=np.int32),
+                    categories=self.accounts,
+                ),
+                "description": pd.Categorical.from_codes(
+                    np.frombuffer(self.description_codes, dtype=np.int32),
+                    categories=self.descriptions,
+                ),
+                "amount": np.frombuffer(self.amounts, dtype=np.float64),
+            }
+        )
+
+    @staticmethod
+    def _code(value, values, value_to_code):
+        if value is None:
+            return -1
+        code = value_to_code.get(value)
+        if code is None:
+            code = len(values)
+            values.append(value)
+            value_to_code[value] = code
+        return code
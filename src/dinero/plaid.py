@@ -1,90 +1,426 @@
+import functools
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pendulum
 from loguru import logger
-from pendulum import Date
+from pendulum import Date, DateTime
 from plaid import Client
 from plaid import errors as plaid_errors
+from plaid.api.api import API
+from requests import exceptions as requests_errors
 
 from dinero.application import Application
 from dinero.utils import base as baseutils
+from dinero.utils.fs import JSONCache, Path
 
 
 CLIENT = None
+CLIENT_LOCK = threading.Lock()  # So threads share one client and rate limit
+UNKNOWN_ACCOUNT_IDS = set()  # Logged by account_id_to_name()
+PAGE_SIZE = 500  # Max count for /transactions/get
+SYNC_PAGE_SIZE = 500  # Max count for /transactions/sync
+
+# Plaid errors that are worth retrying
+RETRYABLE_ERROR_TYPES = {"RATE_LIMIT_EXCEEDED", "API_ERROR", "INSTITUTION_ERROR"}
+RETRYABLE_ERROR_CODES = {"PRODUCT_NOT_READY"}
 
 
 def get_client(app: Application):
-    """Get a Plaid client"""
+    """Get a Plaid client
+    Wrapped in a RetryingClient configured from the `plaid` config section.
+    Created once per process, safe to call from several threads.
+    """
     global CLIENT
-    if not CLIENT:
-        plaid_client_id = app.config.plaid.client_id
-        plaid_secret = app.config.plaid.secret
-        # plaid_public_key = app.config.plaid.public_key
-        plaid_env = app.config.plaid.env
-
-        CLIENT = Client(
-            client_id=plaid_client_id,
-            secret=plaid_secret,
-            # public_key=plaid_public_key,
-            environment=plaid_env,
-            suppress_warnings=True,
-        )
+    with CLIENT_LOCK:
+        if not CLIENT:
+            plaid_client_id = app.config.plaid.client_id
+            plaid_secret = app.config.plaid.secret
+            # plaid_public_key = app.config.plaid.public_key
+            plaid_env = app.config.plaid.env
+
+            client = Client(
+                client_id=plaid_client_id,
+                secret=plaid_secret,
+                # public_key=plaid_public_key,
+                environment=plaid_env,
+                suppress_warnings=True,
+            )
+            CLIENT = RetryingClient.from_config(app, client)
 
     return CLIENT
 
 
-def get_all_transactions(app: Application, date: str | Date, days=30):
-    """Get transactions for all institutions"""
-    all_transactions = TransactionList()
-    for account_name, access_token in app.config.plaid.tokens.items():
-        all_transactions.extend(
-            get_transactions(app, account_name, date=date, days=days)
+class TokenBucket:
+    """Thread-safe token bucket rate limiter
+
+    Parameters
+    ----------
+        rate: Tokens added per second
+        capacity: Max tokens, the size of a burst
+    """
+
+    def __init__(self, rate: float, capacity: int, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.clock = clock
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self, sleep=time.sleep):
+        """Take a token, waiting until one is available"""
+        while True:
+            with self.lock:
+                now = self.clock()
+                elapsed = now - self.updated
+                self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            sleep(wait)
+
+
+def is_retryable(ex: Exception) -> bool:
+    """Check if an error from the Plaid client is transient"""
+    if isinstance(ex, plaid_errors.PlaidError):
+        return ex.type in RETRYABLE_ERROR_TYPES or ex.code in RETRYABLE_ERROR_CODES
+    return isinstance(ex, (requests_errors.ConnectionError, requests_errors.Timeout))
+
+
+class RetryingClient:
+    """Wraps a Plaid Client to rate limit and retry the API calls
+
+    Calls wait for a token of a TokenBucket shared by all the threads.
+    Retryable errors (see `is_retryable()`) are retried with exponential
+    backoff and full jitter. Latency and retries of each call are logged
+    (debug) and added to `metrics`.
+
+    Exposes the same API as the Client, e.g. `client.Transactions.get()`
+    and `client.post()`. All the public methods of the client and of its API
+    groups (see `is_api_group()`) are wrapped, fake clients with the same
+    attributes too.
+    """
+
+    def __init__(
+        self,
+        client,
+        limiter: TokenBucket,
+        max_retries=5,
+        backoff=1.0,
+        max_backoff=30.0,
+        sleep=time.sleep,
+    ):
+        self.client = client
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+
+        self.metrics = {"calls": 0, "retries": 0, "failures": 0, "seconds": 0.0}
+        self.metrics_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, app: Application, client):
+        config = app.config.plaid
+        return cls(
+            client,
+            TokenBucket(config.rate_limit, config.rate_burst),
+            max_retries=config.max_retries,
+            backoff=config.backoff,
+            max_backoff=config.max_backoff,
         )
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if name.startswith("_"):
+            return attr
+        if callable(attr):
+            return functools.partial(self.call, name, attr)
+        # API groups of the client, e.g. client.Transactions
+        if is_api_group(attr):
+            return _RetryingAPI(self, name, attr)
+        return attr
+
+    def post(self, path, data, *args, **kwargs):
+        return self.call(path, self.client.post, path, data, *args, **kwargs)
+
+    def call(self, name, func, *args, **kwargs):
+        """Call `func` with rate limiting and retries"""
+        retries = 0
+        while True:
+            self.limiter.acquire(sleep=self.sleep)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as ex:
+                seconds = time.perf_counter() - start
+                if not is_retryable(ex) or retries >= self.max_retries:
+                    self._record(name, seconds, retries, failed=True)
+                    raise
+
+                delay = random.uniform(
+                    0, min(self.max_backoff, self.backoff * 2**retries)
+                )
+                retries += 1
+                logger.bind(
+                    call=name,
+                    retry=retries,
+                    delay=round(delay, 3),
+                    error=getattr(ex, "code", type(ex).__name__),
+                ).warning("Plaid call failed, retrying")
+                self._record(name, seconds, 0, retry=True)
+                self.sleep(delay)
+                continue
+
+            self._record(name, time.perf_counter() - start, retries)
+            return result
+
+    def _record(self, name, seconds, retries, failed=False, retry=False):
+        with self.metrics_lock:
+            self.metrics["calls"] += 1
+            self.metrics["seconds"] += seconds
+            self.metrics["retries"] += 1 if retry else 0
+            self.metrics["failures"] += 1 if failed else 0
+        if not retry:
+            logger.bind(
+                call=name, seconds=round(seconds, 3), retries=retries, failed=failed
+            ).debug("Plaid call")
+
+    def log_metrics(self):
+        """Log the totals of all the calls"""
+        with self.metrics_lock:
+            metrics = dict(self.metrics)
+        metrics["seconds"] = round(metrics["seconds"], 3)
+        logger.bind(**metrics).info("Plaid calls")
+
+
+def is_api_group(attr, _seen=None) -> bool:
+    """Check if an attribute of a client is a group of API methods
+
+    Plaid `API` objects and, so fake clients can be wrapped too, any object
+    that is not a builtin type and has public methods or nested groups.
+    """
+    if isinstance(attr, API):
+        return True
+    if type(attr).__module__ == "builtins":
+        return False
+    seen = (_seen or set()) | {id(attr)}
+    for name in dir(attr):
+        if name.startswith("_"):
+            continue
+        value = getattr(attr, name, None)
+        if callable(value):
+            return True
+        if id(value) not in seen and is_api_group(value, seen):
+            return True
+    return False
+
+
+class _RetryingAPI:
+    """API group of a Plaid Client with all its methods, and the ones of its
+    nested groups, going through `RetryingClient.call()`
+    """
+
+    def __init__(self, retrying: RetryingClient, name, api):
+        self.retrying = retrying
+        self.name = name
+        self.api = api
+
+    def __getattr__(self, name):
+        attr = getattr(self.api, name)
+        if name.startswith("_"):
+            return attr
+        if callable(attr):
+            return functools.partial(self.retrying.call, f"{self.name}.{name}", attr)
+        # Nested groups, e.g. client.Item.public_token
+        if is_api_group(attr):
+            return _RetryingAPI(self.retrying, f"{self.name}.{name}", attr)
+        return attr
+
+
+def get_all_transactions(
+    app: Application,
+    date: str | Date,
+    days=30,
+    workers=None,
+    client=None,
+    cache=None,
+    replay=False,
+):
+    """Get transactions for all institutions
+
+    Institutions are fetched in parallel on a thread pool. If one fails the
+    error is logged and stored in the `errors` of the result, the others are
+    still returned. Transactions are always in the order of the config tokens.
+
+    Parameters
+    ----------
+        workers: Max number of institutions fetched at the same time.
+            Defaults to `plaid.workers` on the config
+        client: Plaid client to use instead of `get_client()`
+        cache: ResponseCache to read and save the raw Plaid pages
+        replay: Only read the pages from `cache`, see `get_transactions()`
+    """
+    if not replay:
+        client = client or get_client(app)
+
+    all_transactions = TransactionList()
+    all_transactions.app = app
+    all_transactions.errors = {}
+
+    results = for_each_institution(
+        app,
+        lambda name: get_transactions(
+            app, name, date=date, days=days, client=client, cache=cache, replay=replay
+        ),
+        workers=workers,
+    )
+    for name, transactions, error in results:
+        if error is None:
+            all_transactions.extend(transactions)
+        else:
+            all_transactions.errors[name] = error
+
     return all_transactions
 
 
-def get_transactions(app: Application, name, date: str | Date, days=30):
+def for_each_institution(app: Application, func, workers=None):
+    """Call `func(name)` for each institution on the config on a thread pool
+
+    Returns
+    -------
+        List of (name, result, error) in the order of the config tokens.
+        If `func` raises, result is None and error is the exception.
+    """
+    if workers is None:
+        workers = app.config.plaid.workers
+    names = list(app.config.plaid.tokens)
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = [executor.submit(func, name) for name in names]
+
+    results = []
+    for name, future in zip(names, futures):
+        try:
+            results.append((name, future.result(), None))
+        except Exception as ex:
+            logger.bind(name=name, error=str(ex)).error(
+                "Transactions download failed"
+            )
+            results.append((name, None, ex))
+    return results
+
+
+def get_transactions(
+    app: Application,
+    name,
+    date: str | Date,
+    days=30,
+    client=None,
+    page_workers=None,
+    cache=None,
+    replay=False,
+):
     """Get transactions for one account based on the access token
 
+    Pages use the max page size. After the first page the rest are
+    requested in parallel and joined in order.
+
     Parameters
     ----------
         name: Name of the institution on the config
         date: last day to end the transactions range
         days: number of days back from `date` to get transactions for
+        client: Plaid client to use instead of `get_client()`
+        page_workers: Max number of pages requested at the same time.
+            Defaults to `plaid.page_workers` on the config
+        cache: ResponseCache, pages are read from it if they are not expired
+            and saved to it after downloading them
+        replay: Don't use the network, read all the pages from `cache`
+            (ignoring the TTL) using the date range of the last download
     """
     access_token = app.config.plaid.tokens[name]
     start_date, end_date = baseutils.get_dates_from_delta(date=date, days=days)
 
-    # Get transactions in Plaid API JSON
-    client = get_client(app)
-    try:
-        response = client.Transactions.get(
-            access_token, start_date=start_date, end_date=end_date
-        )
-    except plaid_errors.ItemError as ex:
-        if "the login details of this item have changed" in str(ex):
-            raise Exception("Credentials expired for account: %s" % name)
-        else:
-            raise ex
-
-    # This loop goes through the Plaid pagination
-    transactions_api_json = response["transactions"]
-    while len(transactions_api_json) < response["total_transactions"]:
-        response = client.Transactions.get(
+    if replay:
+        if cache is None:
+            raise ValueError("A cache is required to replay transactions")
+        last_range = cache.last_range(name)
+        if last_range is None:
+            raise Exception("No cached transactions for account: %s" % name)
+        start_date, end_date = last_range
+    else:
+        client = client or get_client(app)
+
+    if page_workers is None:
+        page_workers = app.config.plaid.page_workers
+
+    def get_page(offset):
+        if cache is not None:
+            page = cache.get(name, start_date, end_date, offset, expire=not replay)
+            if page is not None:
+                return page
+            if replay:
+                raise Exception(
+                    "Page not cached for account: %s offset: %i" % (name, offset)
+                )
+
+        page = client.Transactions.get(
             access_token,
             start_date=start_date,
             end_date=end_date,
-            offset=len(transactions_api_json),
+            count=PAGE_SIZE,
+            offset=offset,
         )
+        if cache is not None:
+            cache.set(name, start_date, end_date, offset, page)
+        return page
+
+    try:
+        response = get_page(0)
+    except plaid_errors.ItemError as ex:
+        raise_item_error(name, ex)
+
+    # The first page has the total so the other offsets are known
+    total = response["total_transactions"]
+    offsets = range(len(response["transactions"]), total, PAGE_SIZE)
+    with ThreadPoolExecutor(max_workers=max(page_workers, 1)) as executor:
+        pages = list(executor.map(get_page, offsets))
+
+    transactions_api_json = response["transactions"]
+    for page in pages:
+        transactions_api_json.extend(page["transactions"])
+
+    # Transactions can change while paginating, get the rest one page at a time
+    while len(transactions_api_json) < total:
+        response = get_page(len(transactions_api_json))
+        if not response["transactions"]:
+            break
         transactions_api_json.extend(response["transactions"])
+        total = response["total_transactions"]
+
+    if len(transactions_api_json) != total:
+        logger.bind(
+            name=name, records=len(transactions_api_json), total=total
+        ).warning("Downloaded transactions don't match the total")
     logger.bind(name=name, records=len(transactions_api_json)).info(
         "Transactions downloaded"
     )
+    if cache is not None and not replay:
+        cache.set_last_range(name, start_date, end_date)
 
     # From Plaid API JSON format to the classes in this file
     transactions = TransactionList()
     transactions.app = app
 
-    for transaction_json in transactions_api_json:
-        transactions.append_from_plaid(transaction_json)
+    transactions.extend_from_plaid(transactions_api_json)
 
     logger.bind(name=name, records=len(transactions.pending)).info(
         "Transactions pending"
@@ -95,39 +431,144 @@ def get_transactions(app: Application, name, date: str | Date, days=30):
     return transactions
 
 
+def sync_transactions(app: Application, name, cursor=None, client=None):
+    """Get the transactions added, modified and removed since `cursor`
+    using the Plaid /transactions/sync endpoint
+
+    Parameters
+    ----------
+        name: Name of the institution on the config
+        cursor: Cursor returned by the last sync, None for a full sync
+        client: Plaid client to use instead of `get_client()`
+
+    Returns
+    -------
+        TransactionDelta
+    """
+    access_token = app.config.plaid.tokens[name]
+    client = client or get_client(app)
+
+    # Plaid asks to restart from the original cursor if the data changes
+    # while paginating
+    while True:
+        delta = TransactionDelta(app, name, cursor)
+        try:
+            has_more = True
+            while has_more:
+                response = client.post(
+                    "/transactions/sync",
+                    {
+                        "access_token": access_token,
+                        "cursor": delta.cursor or "",
+                        "count": SYNC_PAGE_SIZE,
+                    },
+                )
+                delta.added.extend_from_plaid(response["added"])
+                delta.modified.extend_from_plaid(response["modified"])
+                delta.removed.extend(
+                    removed["transaction_id"] for removed in response["removed"]
+                )
+                delta.cursor = response["next_cursor"]
+                has_more = response["has_more"]
+        except plaid_errors.ItemError as ex:
+            raise_item_error(name, ex)
+        except plaid_errors.PlaidError as ex:
+            if ex.code == "TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION":
+                logger.bind(name=name).warning("Transactions changed, restarting sync")
+                continue
+            raise ex
+        break
+
+    logger.bind(
+        name=name,
+        added=len(delta.added),
+        modified=len(delta.modified),
+        removed=len(delta.removed),
+    ).info("Transactions synced")
+    return delta
+
+
+def raise_item_error(name, ex):
+    """Raise a readable error for Plaid ItemErrors"""
+    if "the login details of this item have changed" in str(ex):
+        raise Exception("Credentials expired for account: %s" % name)
+    raise ex
+
+
 def account_id_to_name(app: Application, account_id):
-    """Convert a Plaid account ID to a human readable name from the config"""
+    """Convert a Plaid account ID to a human readable name from the config
+    Unknown IDs are logged only once and returned as they are
+    """
     plaid_id_to_name = app.config.plaid.account_id_to_name
     if account_id in plaid_id_to_name:
         return plaid_id_to_name[account_id]
     else:
-        logger.error(
-            "ID not found in the accounts map, add it to the settings.toml "
-            "on section: plaid.account_id_to_name",
-            account_id=account_id,
-        )
+        if account_id not in UNKNOWN_ACCOUNT_IDS:
+            UNKNOWN_ACCOUNT_IDS.add(account_id)
+            logger.error(
+                "ID not found in the accounts map, add it to the settings.toml "
+                "on section: plaid.account_id_to_name",
+                account_id=account_id,
+            )
         return account_id
 
 
+@functools.lru_cache(maxsize=4096)
+def parse_date(value: str, tz: str) -> DateTime:
+    """Parse a Plaid date on a timezone
+
+    Plaid dates are plain YYYY-MM-DD strings so they are built directly
+    instead of going through `pendulum.parse()`. Results are memoized,
+    a batch has only a few distinct dates.
+    """
+    if len(value) == 10 and value[4] == "-" and value[7] == "-":
+        return pendulum.datetime(
+            int(value[:4]), int(value[5:7]), int(value[8:]), tz=tz
+        )
+    return pendulum.parse(value, tz=tz)
+
+
 class TransactionList(list):
+    """List of Transactions
+
+    The pending/not pending partitions and the account groups are computed
+    in a single pass the first time one is used and cached until the list
+    changes. Don't modify the returned lists.
+    """
+
     app: Application
+    errors: dict[str, Exception]  # {institution name: error} when downloading
+    _partitions = None  # (pending, not_pending, groups) cached by _partition()
+
+    def _partition(self):
+        if self._partitions is None:
+            pending, not_pending, groups = TransactionList(), TransactionList(), {}
+            for item in self:
+                list.append(pending if item.pending else not_pending, item)
+                group = groups.get(item.account_name)
+                if group is None:
+                    group = groups[item.account_name] = TransactionList()
+                list.append(group, item)
+            self._partitions = (pending, not_pending, groups)
+        return self._partitions
 
     @property
     def pending(self):
         """Filter by pending transactions
-        Returns a new TransactionList
+        Returns a cached TransactionList
         """
-        return TransactionList(filter(lambda x: x.pending, self))
+        return self._partition()[0]
 
     @property
     def not_pending(self):
         """Filter by not pending transactions
-        Returns a new TransactionList
+        Returns a cached TransactionList
         """
-        return TransactionList(filter(lambda x: not x.pending, self))
+        return self._partition()[1]
 
     def append(self, item, *args, **kwargs):
         if isinstance(item, Transaction):
+            self._partitions = None
             super(TransactionList, self).append(item, *args, **kwargs)
         else:
             raise ValueError(
@@ -139,24 +580,167 @@ class TransactionList(list):
         new = Transaction.from_plaid(self.app, transaction_json)
         self.append(new)
 
+    def extend_from_plaid(self, transactions_json):
+        """Convert a list of plaid json to Transaction classes and append them"""
+        self._partitions = None
+        super(TransactionList, self).extend(
+            Transaction.from_plaid_batch(self.app, transactions_json)
+        )
+
     def group_by_account(self):
-        """Returns a dictionary of {account_name: transaction_of_that_account}"""
-        groups = {}
-        for item in self:
-            account_name = item.account_name
-            if account_name in groups:
-                groups[account_name].append(item)
-            else:
-                t_list = TransactionList()
-                t_list.append(item)
-                groups[account_name] = t_list
-        return groups
+        """Returns a dictionary of {account_name: transaction_of_that_account}
+        The dictionary is cached
+        """
+        return self._partition()[2]
+
+    def count_by_account(self):
+        """Returns a dictionary of {account_name: number of transactions}"""
+        return {name: len(group) for name, group in self._partition()[2].items()}
+
+
+def _invalidates_partitions(name):
+    method = getattr(list, name)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._partitions = None
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+for _name in (
+    "extend",
+    "insert",
+    "remove",
+    "pop",
+    "clear",
+    "sort",
+    "reverse",
+    "__setitem__",
+    "__delitem__",
+    "__iadd__",
+    "__imul__",
+):
+    setattr(TransactionList, _name, _invalidates_partitions(_name))
+
+
+class ResponseCache:
+    """Raw Plaid /transactions/get pages saved as JSON files
+
+    Each page is saved on a `JSONCache` file keyed by the institution,
+    date range, page size and offset of the request.
+    Files older than `ttl` seconds are expired.
+
+    Usage
+    -----
+        cache = ResponseCache(app.cache_dir / "plaid", ttl=3600)
+        cache.evict()
+        get_all_transactions(app, date, days, cache=cache)
+    """
+
+    def __init__(self, path: Path, ttl: int):
+        self.files = JSONCache(path, ttl=ttl)
+
+    def get(self, name, start_date, end_date, offset, expire=True):
+        """Cached page or None if it doesn't exist or expired"""
+        key = [name, start_date, end_date, PAGE_SIZE, offset]
+        return self.files.get(key, expire=expire)
+
+    def set(self, name, start_date, end_date, offset, page):
+        self.files.set([name, start_date, end_date, PAGE_SIZE, offset], page)
+
+    def last_range(self, name):
+        """(start_date, end_date) of the last complete download or None"""
+        last_range = self.files.get(["last_range", name], expire=False)
+        return None if last_range is None else tuple(last_range)
+
+    def set_last_range(self, name, start_date, end_date):
+        self.files.set(["last_range", name], [start_date, end_date])
+
+    def evict(self):
+        """Delete the expired pages
+
+        Returns
+        -------
+            Number of files deleted
+        """
+        return self.files.evict()
+
+
+class TransactionDelta:
+    """Changes of one institution returned by `sync_transactions()`"""
+
+    def __init__(self, app: Application, name, cursor=None):
+        self.name = name
+        self.cursor = cursor  # Cursor to use on the next sync
+        self.added = TransactionList()
+        self.added.app = app
+        self.modified = TransactionList()
+        self.modified.app = app
+        self.removed = []  # Plaid transaction ids
+
+
+class SyncState:
+    """Sync cursor of each institution
+
+    Saved as JSON on `app.config_dir / "plaid_sync.json"`. Modified and
+    removed transactions are found on the DB by their `plaid_id`.
+
+    Files written by older versions also map each Plaid transaction id to
+    the dedup key of its DB row, see `pop_legacy_keys()`.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.institutions = {}
+        if self.path.exists():
+            self.institutions = json.loads(self.path.read_text("utf-8"))
+
+    def _institution(self, name):
+        return self.institutions.setdefault(name, {"cursor": None})
+
+    def cursor(self, name):
+        return self._institution(name)["cursor"]
+
+    def set_cursor(self, name, cursor):
+        self._institution(name)["cursor"] = cursor
+
+    def pop_legacy_keys(self) -> list[tuple[str, tuple]]:
+        """Remove the old {transaction id: dedup key} maps
+
+        Returns
+        -------
+            List of (Plaid transaction id, dedup key)
+        """
+        items = []
+        for institution in self.institutions.values():
+            transactions = institution.pop("transactions", {})
+            items.extend((id_, tuple(key)) for id_, key in transactions.items())
+        return items
+
+    def save(self):
+        self.path.ensure_parent_dir_exists()
+        self.path.write_atomic(json.dumps(self.institutions), "w", encoding="utf-8")
 
 
 class Transaction(object):
-    def __init__(self, app):
-        self.app: Application = app
+    __slots__ = (
+        "transaction_id",
+        "account_id",
+        "account_name",
+        "amount",
+        "category",
+        "category_id",
+        "date",
+        "name",
+        "pending",
+    )
+
+    def __init__(self):
+        self.transaction_id = ""
         self.account_id = ""
+        self.account_name = ""
         self.amount = 0
         self.category = []
         self.category_id = 0
@@ -165,21 +749,41 @@ class Transaction(object):
         self.pending = False
 
     @classmethod
-    def from_plaid(cls, app: Application, values):
-        """Create a class from plaid API transaction JSON"""
-        new = cls(app)
+    def from_plaid(cls, app: Application, values, account_name=None):
+        """Create a class from plaid API transaction JSON
+
+        Parameters
+        ----------
+            account_name: Name of the account if already known,
+                if None is looked up with `account_id_to_name()`
+        """
+        new = cls.__new__(cls)
+        new.transaction_id = values.get("transaction_id", "")
         new.account_id = values["account_id"]
+        if account_name is None:
+            account_name = account_id_to_name(app, new.account_id)
+        new.account_name = account_name
         new.amount = values["amount"]
         new.category = values["category"]
         new.category_id = values["category_id"]
-        new.date = pendulum.parse(values["date"], tz=app.config.timezone)
+        new.date = parse_date(values["date"], app.config.timezone)
         new.name = values["name"]
         new.pending = values["pending"]
         return new
 
-    @property
-    def account_name(self):
-        return account_id_to_name(self.app, self.account_id)
+    @classmethod
+    def from_plaid_batch(cls, app: Application, values_list):
+        """Create a list of classes from a list of plaid API transaction JSON
+        Account names are resolved once per account
+        """
+        account_names = {
+            account_id: account_id_to_name(app, account_id)
+            for account_id in {values["account_id"] for values in values_list}
+        }
+        return [
+            cls.from_plaid(app, values, account_names[values["account_id"]])
+            for values in values_list
+        ]
 
     def __str__(self):
         return str(
@@ -192,4 +796,4 @@ class Transaction(object):
         )
 
     def __repr__(self):
-        return str(self.__dict__)
+        return str({slot: getattr(self, slot) for slot in self.__slots__})
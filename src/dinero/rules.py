@@ -1,28 +1,288 @@
-import os
+import hashlib
 import json
+import os
+import re
+from collections import deque
+
+try:
+    # Private modules of CPython's re, only used to prefilter regex rules
+    from re import _constants, _parser
+except ImportError:
+    _constants = _parser = None
 
 from loguru import logger
 from dinero.application import Application
 
 
-def categories_for_transaction(app: Application, description):
-    """Returns category and subcategory for a transaction description
-    based on the existing rules
+PATTERNS_KEY = "__patterns__"
+PATTERN_TYPES = ("exact", "prefix", "substring", "regex")
+
+
+class RuleSet:
+    r"""Category rules from a `category_rules.json` file
+
+    The file is loaded once and reloaded only when its mtime or size change
+    and its content hash is different.
+
+    The file maps descriptions to `[category, subcategory]`. Pattern rules
+    go in a list under the `__patterns__` key:
+
+        {
+            "NETFLIX.COM": ["Entertainment", "Streaming"],
+            "__patterns__": [
+                {"type": "prefix", "pattern": "AMAZON", "category": "Shopping",
+                 "subcategory": "Online", "priority": 10},
+                {"type": "substring", "pattern": "STARBUCKS", ...},
+                {"type": "regex", "pattern": "^UBER\\s+\\*?TRIP", ...}
+            ]
+        }
+
+    Exact matches always win. Otherwise the matching pattern with the highest
+    `priority` (default 0) wins, ties go to the first one in the file.
+    Pattern rules are case-insensitive. See `Matcher`.
+
+    Usage
+    -----
+        rules = RuleSet(app.config_dir / "category_rules.json")
+        category, subcategory = rules.categorize(description)
     """
 
-    generated_rules_path = app.config_dir / "category_rules.json"
+    def __init__(self, path):
+        self.path = path
+        self.rules = {}
+        self.matcher = Matcher([])
+        self._stat = None  # (mtime, size) of the loaded file
+        self._digest = None  # sha256 of the loaded file
+
+    def __len__(self):
+        self.refresh()
+        return len(self.rules)
+
+    def refresh(self):
+        """Reload the rules if the file changed"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self.rules, self._stat, self._digest = {}, None, None
+            self.matcher = Matcher([])
+            return
 
-    if os.path.exists(generated_rules_path):
-        with open(generated_rules_path, "r") as fp:
-            rules = json.load(fp)
-    else:
-        rules = []
+        stat_ = (stat.st_mtime_ns, stat.st_size)
+        if stat_ == self._stat:
+            return
+        self._stat = stat_
+
+        with open(self.path, "rb") as fp:
+            content = fp.read()
+        digest = hashlib.sha256(content).hexdigest()
+        if digest == self._digest:
+            return
+
+        self.rules = json.loads(content)
+        patterns = self.rules.pop(PATTERNS_KEY, [])
+        for rule in patterns:
+            if rule.get("type") == "exact":
+                categories = [rule["category"], rule["subcategory"]]
+                self.rules[rule["pattern"]] = categories
+        self.matcher = Matcher(
+            [rule for rule in patterns if rule.get("type") != "exact"]
+        )
+        self._digest = digest
+        logger.bind(path=self.path, rules=len(self.rules)).debug("Loaded rules")
+
+    def categorize(self, description):
+        """Returns category and subcategory for a transaction description"""
+        self.refresh()
+        return self._match(description)
+
+    def categorize_batch(self, descriptions):
+        """Returns a list of (category, subcategory) for a list of descriptions"""
+        self.refresh()
+        return [self._match(description) for description in descriptions]
+
+    def _match(self, description):
+        if description in self.rules:
+            cat, subcat = self.rules[description][0], self.rules[description][1]
+        else:
+            rule = self.matcher.match(description)
+            if rule is None:
+                return "", ""
+            cat, subcat = rule["category"], rule["subcategory"]
 
-    if description in rules:
-        cat, subcat = rules[description][0], rules[description][1]
         logger.bind(category=cat, subcategory=subcat, desc=description).debug(
             "Automatically adding categories"
         )
-
         return cat, subcat
-    return "", ""
+
+
+class Matcher:
+    """Pattern rules compiled to match a description in a single pass
+
+    Prefix and substring rules go into one Aho-Corasick automaton so the cost
+    depends on the length of the description and not on the number of rules.
+    Regex rules are compiled one by one. The longest literal that every match
+    of a regex contains (see `required_literal()`) is added to the automaton
+    too and the regex only runs on descriptions that contain it. Regexes
+    without a literal, like `foo|bar`, run on every description.
+
+    Parameters
+    ----------
+        rules: List of dicts with keys: type (prefix, substring or regex),
+            pattern, category, subcategory and optionally priority
+    """
+
+    def __init__(self, rules: list[dict]):
+        self.rules = []
+        self.automaton = Automaton()
+        self.regexes = {}  # {rule_id: compiled regex}
+        self.unfiltered = []  # rule_id of the regexes without a literal
+
+        for order, rule in enumerate(rules):
+            type_ = rule.get("type")
+            if type_ not in PATTERN_TYPES:
+                raise ValueError(f"Invalid rule type: {type_}")
+
+            rule_id = len(self.rules)
+            # Rules are ranked by this key, lower is better
+            rank = (-rule.get("priority", 0), order)
+            length = len(rule["pattern"].casefold())
+            self.rules.append((rank, rule, length))
+
+            if type_ == "regex":
+                try:
+                    regex = re.compile(rule["pattern"], re.IGNORECASE | re.DOTALL)
+                except re.error as e:
+                    raise ValueError(f"Invalid regex rule {rule['pattern']!r}: {e}")
+                self.regexes[rule_id] = regex
+
+                literal = required_literal(rule["pattern"])
+                if literal:
+                    self.automaton.add(literal, rule_id)
+                else:
+                    self.unfiltered.append(rule_id)
+            else:
+                self.automaton.add(rule["pattern"].casefold(), rule_id)
+
+        self.automaton.build()
+
+    def __len__(self):
+        return len(self.rules)
+
+    def match(self, description) -> dict | None:
+        """Best ranked rule that matches the description or None"""
+        if not self.rules or not description:
+            return None
+
+        best = None
+        candidates = set(self.unfiltered)
+        for end, rule_id in self.automaton.search(description.casefold()):
+            rank, rule, length = self.rules[rule_id]
+            if rule["type"] == "regex":
+                candidates.add(rule_id)
+                continue
+            if rule["type"] == "prefix" and end + 1 != length:
+                continue
+            if best is None or rank < best[0]:
+                best = (rank, rule)
+
+        # Best ranked first, stop when a regex can't beat the current best
+        for rule_id in sorted(candidates, key=lambda rule_id: self.rules[rule_id][0]):
+            rank, rule, _ = self.rules[rule_id]
+            if best is not None and rank > best[0]:
+                break
+            if self.regexes[rule_id].search(description):
+                best = (rank, rule)
+                break
+
+        return None if best is None else best[1]
+
+
+def required_literal(pattern: str) -> str:
+    """Longest run of literal characters that every match of a regex
+    contains, casefolded, or "" if there is none
+
+    Only ASCII characters are used. "i" is left out too, with IGNORECASE it
+    also matches "İ" and "ı" which don't casefold to "i".
+
+    The regex is parsed with the private `re._parser`. If it's not available
+    or its output changed, "" is returned and the regex runs on every
+    description.
+    """
+    if _parser is None:
+        return ""
+
+    longest, run = "", ""
+    try:
+        items = _parser.parse(pattern, re.IGNORECASE | re.DOTALL)
+        for op, value in _flatten(items):
+            char = chr(value) if op == _constants.LITERAL else ""
+            if char.isascii() and char not in ("", "i", "I"):
+                run += char
+            else:
+                run = ""
+            longest = max(longest, run, key=len)
+    except Exception:
+        return ""
+    return longest.casefold()
+
+
+def _flatten(items):
+    """Items of a parsed regex with the groups replaced by their items"""
+    for op, value in items:
+        if op == _constants.SUBPATTERN:
+            yield from _flatten(value[-1])
+        else:
+            yield op, value
+
+
+class Automaton:
+    """Aho-Corasick automaton to find all the words that appear in a text"""
+
+    def __init__(self):
+        self.goto = [{}]  # {char: state} for each state
+        self.fail = [0]
+        self.output = [[]]  # Values of the words that end on each state
+
+    def add(self, word: str, value):
+        state = 0
+        for char in word:
+            next_ = self.goto[state].get(char)
+            if next_ is None:
+                next_ = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][char] = next_
+            state = next_
+        self.output[state].append(value)
+
+    def build(self):
+        """Compute the failure links, call after adding all the words"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_ in self.goto[state].items():
+                queue.append(next_)
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                fail_ = self.goto[fail].get(char, 0)
+                self.fail[next_] = fail_
+                self.output[next_] = self.output[next_] + self.output[fail_]
+
+    def search(self, text: str):
+        """Yields (end index, value) for each word found in the text"""
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for value in self.output[state]:
+                yield i, value
+
+
+def categories_for_transaction(app: Application, description):
+    """Returns category and subcategory for a transaction description
+    based on the existing rules
+    """
+    return app.rules.categorize(description)
@@ -0,0 +1,64 @@
+"""On-disk cache of `dinero search` results
+
+Results are keyed by the search parameters and a watermark of the
+transactions table, see `cli.search.search_cache_key()`. Any write to the
+table gives a new key so stale results are never returned, the old files
+are evicted as the least recently used.
+"""
+
+import time
+
+from dinero.application import Application
+from dinero.utils.fs import JSONCache, Path
+
+
+def last_write_file(app: Application) -> Path:
+    return app.cache_dir / "search" / "last_write"
+
+
+def mark_table_changed(app: Application):
+    """Save the time of a write to the transactions table
+    Called by `db.Table` after it inserts, updates or deletes rows
+    """
+    path = last_write_file(app)
+    path.ensure_parent_dir_exists()
+    path.write_atomic(str(time.time_ns()), "w", encoding="utf-8")
+
+
+def last_table_write(app: Application) -> int | None:
+    """Time in ns of the last `db.Table` write or None"""
+    try:
+        return int(last_write_file(app).read_text("utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+class SearchCache(JSONCache):
+    """Search results saved as JSON files with LRU eviction
+
+    After each write the least recently used files are deleted until there
+    are at most `max_entries` files using at most `max_bytes`.
+
+    Usage
+    -----
+        cache = SearchCache.from_config(app)
+        result = cache.get(key)
+        if result is None:
+            cache.set(key, result)
+    """
+
+    def __init__(self, path: Path, max_bytes: int, max_entries: int):
+        super().__init__(path, max_entries=max_entries, max_bytes=max_bytes, lru=True)
+
+    @classmethod
+    def from_config(cls, app: Application):
+        config = app.config.search
+        return cls(
+            app.cache_dir / "search",
+            max_bytes=config.cache_max_mb * 1024 * 1024,
+            max_entries=config.cache_max_entries,
+        )
+
+    def set(self, key, value):
+        super().set(key, value)
+        self.evict()
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import os
 import pathlib
 import sys
+import time
 from typing import Any
 
 import tomllib
@@ -64,6 +67,111 @@ class Path(type(pathlib.Path())):
         os.replace(path, self)
 
 
+class JSONCache:
+    """JSON values saved as files in a directory
+
+    Each value is saved on `<sha256 of the key>.json`, the key is any JSON
+    serializable value. Writes are atomic so readers never see a partial file.
+
+    `evict()` deletes the files older than `ttl` seconds and then the oldest
+    files until there are at most `max_entries` files using at most
+    `max_bytes`. The age of a file is its mtime: the last write or, with
+    `lru=True`, the last read too.
+
+    Usage
+    -----
+        cache = JSONCache(app.cache_dir / "name", ttl=3600, max_entries=100)
+        value = cache.get(key)
+        if value is None:
+            cache.set(key, value)
+        cache.evict()
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        ttl: float | None = None,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+        lru: bool = False,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lru = lru
+
+    def file(self, key: Any) -> Path:
+        data = json.dumps(key, sort_keys=True, default=str)
+        digest = hashlib.sha256(data.encode("utf-8")).hexdigest()
+        return self.path / f"{digest}.json"
+
+    def get(self, key: Any, expire: bool = True) -> Any:
+        """Cached value or None if it doesn't exist, expired or is not valid
+
+        Parameters
+        ----------
+            expire: If False values older than `ttl` are returned too
+        """
+        file = self.file(key)
+        try:
+            if expire and self._expired(file.stat().st_mtime):
+                return None
+            value = json.loads(file.read_text("utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+        if self.lru:
+            file.touch()
+        return value
+
+    def set(self, key: Any, value: Any) -> None:
+        self.path.ensure_dir_exists()
+        self.file(key).write_atomic(json.dumps(value), "w", encoding="utf-8")
+
+    def delete(self, key: Any) -> None:
+        self.file(key).unlink(missing_ok=True)
+
+    def evict(self) -> int:
+        """Delete the expired files and the oldest ones over the limits
+
+        Returns
+        -------
+            Number of files deleted
+        """
+        if not self.path.exists():
+            return 0
+
+        files = []
+        deleted = 0
+        for file in self.path.glob("*.json"):
+            try:
+                stat = file.stat()
+            except FileNotFoundError:
+                continue
+            if self._expired(stat.st_mtime):
+                file.unlink(missing_ok=True)
+                deleted += 1
+            else:
+                files.append((stat.st_mtime, stat.st_size, file))
+        files.sort()
+
+        count = len(files)
+        total = sum(size for _, size, _ in files)
+        for _, size, file in files:
+            if (self.max_entries is None or count <= self.max_entries) and (
+                self.max_bytes is None or total <= self.max_bytes
+            ):
+                break
+            file.unlink(missing_ok=True)
+            count -= 1
+            total -= size
+            deleted += 1
+        return deleted
+
+    def _expired(self, mtime: float) -> bool:
+        return self.ttl is not None and time.time() - mtime > self.ttl
+
+
 def load_toml_data(data: str) -> dict[str, Any]:
     return tomllib.loads(data)
 
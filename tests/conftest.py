@@ -0,0 +1,41 @@
+import pytest
+
+from dinero import Application
+
+
+CONFIG = """
+timezone = "US/Central"
+
+[plaid]
+client_id = "client"
+secret = "secret"
+env = "sandbox"
+products = "transactions"
+workers = {workers}
+page_workers = 2
+
+[plaid.tokens]
+{tokens}
+
+[plaid.account_id_to_name]
+{accounts}
+
+[database]
+connection_string = "sqlite:///{db}"
+"""
+
+INSTITUTIONS = [f"bank_{i}" for i in range(8)]
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Application with 8 institutions, each with one account"""
+    config = CONFIG.format(
+        workers=8,
+        tokens="\n".join(f'{name} = "token-{name}"' for name in INSTITUTIONS),
+        accounts="\n".join(f'acc-{name} = "{name} Checking"' for name in INSTITUTIONS),
+        db=tmp_path / "dinero.db",
+    )
+    path = tmp_path / "config.toml"
+    path.write_text(config)
+    return Application(config_file=str(path))
@@ -0,0 +1,81 @@
+import os
+import time
+
+from dinero.utils.fs import JSONCache, Path
+
+
+def age(file, seconds):
+    mtime = time.time() - seconds
+    os.utime(file, (mtime, mtime))
+
+
+def test_values_are_saved_by_the_sha256_of_the_key(tmp_path):
+    cache = JSONCache(Path(tmp_path))
+    cache.set(["bank_1", "2024-01-01", 0], {"transactions": [1, 2]})
+
+    assert cache.get(["bank_1", "2024-01-01", 0]) == {"transactions": [1, 2]}
+    assert cache.get(["bank_1", "2024-01-01", 500]) is None
+    assert cache.file({"b": 1, "a": 2}) == cache.file({"a": 2, "b": 1})
+    assert len(cache.file("key").stem) == 64
+    assert list(tmp_path.iterdir()) == [cache.file(["bank_1", "2024-01-01", 0])]
+
+
+def test_invalid_files_are_a_miss(tmp_path):
+    cache = JSONCache(Path(tmp_path))
+    cache.file("key").write_text("{not json")
+
+    assert cache.get("key") is None
+
+
+def test_delete(tmp_path):
+    cache = JSONCache(Path(tmp_path))
+    cache.set("key", 1)
+    cache.delete("key")
+    cache.delete("missing")
+
+    assert cache.get("key") is None
+
+
+def test_expired_values(tmp_path):
+    cache = JSONCache(Path(tmp_path), ttl=60)
+    cache.set("old", 1)
+    cache.set("new", 2)
+    age(cache.file("old"), 120)
+
+    assert cache.get("old") is None
+    assert cache.get("old", expire=False) == 1
+    assert cache.evict() == 1
+    assert cache.get("old", expire=False) is None
+    assert cache.get("new") == 2
+
+
+def test_evict_oldest_over_the_limits(tmp_path):
+    cache = JSONCache(Path(tmp_path), max_entries=2)
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.set(key, key)
+        age(cache.file(key), 30 - i)
+
+    assert cache.evict() == 1
+    assert cache.get("a") is None
+    assert cache.get("b") == "b"
+
+    cache = JSONCache(Path(tmp_path), max_bytes=len('"c"'))
+    assert cache.evict() == 1
+    assert cache.get("c") == "c"
+
+
+def test_lru_reads_keep_files(tmp_path):
+    cache = JSONCache(Path(tmp_path), max_entries=1, lru=True)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    age(cache.file("a"), 20)
+    age(cache.file("b"), 10)
+
+    assert cache.get("a") == 1
+    assert cache.evict() == 1
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+
+
+def test_evict_missing_directory(tmp_path):
+    assert JSONCache(Path(tmp_path / "missing"), ttl=1).evict() == 0
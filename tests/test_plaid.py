@@ -0,0 +1,248 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from plaid import errors as plaid_errors
+
+from dinero import plaid
+from conftest import INSTITUTIONS
+
+
+def transaction_json(token, i):
+    name = token.removeprefix("token-")
+    return {
+        "transaction_id": f"{name}-{i}",
+        "account_id": f"acc-{name}",
+        "amount": float(i),
+        "category": [],
+        "category_id": 0,
+        "date": "2024-01-02",
+        "name": f"{name} transaction {i}",
+        "pending": False,
+    }
+
+
+class StubTransactions:
+    """Fake `client.Transactions` with `total` transactions per access token
+
+    Parameters
+    ----------
+        on_call: Called with the access token before returning each page
+    """
+
+    def __init__(self, total=3, on_call=None):
+        self.total = total
+        self.on_call = on_call
+
+    def get(self, access_token, start_date, end_date, count, offset):
+        if self.on_call is not None:
+            self.on_call(access_token)
+        end = min(offset + count, self.total)
+        return {
+            "transactions": [
+                transaction_json(access_token, i) for i in range(offset, end)
+            ],
+            "total_transactions": self.total,
+        }
+
+
+class StubClient:
+    def __init__(self, transactions):
+        self.Transactions = transactions
+
+
+def get_all(app, client):
+    return plaid.get_all_transactions(
+        app, date="2024-01-31", days=30, workers=8, client=client
+    )
+
+
+def test_institutions_are_fetched_concurrently(app):
+    # Each call waits for the others, fails if they run one after the other
+    barrier = threading.Barrier(len(INSTITUTIONS), timeout=5)
+    client = StubClient(StubTransactions(on_call=lambda token: barrier.wait()))
+
+    transactions = get_all(app, client)
+
+    assert transactions.errors == {}
+    assert len(transactions) == 3 * len(INSTITUTIONS)
+
+
+def test_transactions_keep_the_order_of_the_config(app):
+    # Later institutions answer first
+    events = {f"token-{name}": threading.Event() for name in INSTITUTIONS}
+
+    def on_call(token):
+        i = INSTITUTIONS.index(token.removeprefix("token-"))
+        if i + 1 < len(INSTITUTIONS):
+            events[f"token-{INSTITUTIONS[i + 1]}"].wait(timeout=5)
+        events[token].set()
+
+    transactions = get_all(app, StubClient(StubTransactions(on_call=on_call)))
+
+    names = [transaction.account_name for transaction in transactions]
+    expected = [f"{name} Checking" for name in INSTITUTIONS for _ in range(3)]
+    assert names == expected
+
+
+def test_failed_institution_does_not_stop_the_others(app):
+    def on_call(token):
+        if token == "token-bank_3":
+            raise RuntimeError("bank_3 is down")
+
+    transactions = get_all(app, StubClient(StubTransactions(on_call=on_call)))
+
+    assert list(transactions.errors) == ["bank_3"]
+    assert str(transactions.errors["bank_3"]) == "bank_3 is down"
+    accounts = {transaction.account_name for transaction in transactions}
+    assert accounts == {f"{name} Checking" for name in INSTITUTIONS if name != "bank_3"}
+
+
+def test_pages_are_joined_in_order(app):
+    client = StubClient(StubTransactions(total=plaid.PAGE_SIZE * 2 + 7))
+
+    transactions = plaid.get_transactions(
+        app, "bank_0", date="2024-01-31", days=30, client=client
+    )
+
+    ids = [transaction.transaction_id for transaction in transactions]
+    assert ids == [f"bank_0-{i}" for i in range(plaid.PAGE_SIZE * 2 + 7)]
+
+
+def plaid_error(type_, code):
+    return plaid_errors.PlaidError("error", type_, code, "")
+
+
+class FlakyTransactions(StubTransactions):
+    """Raises each error in `errors` once before returning the pages"""
+
+    def __init__(self, errors, **kwargs):
+        super().__init__(**kwargs)
+        self.errors = list(errors)
+        self.calls = 0
+
+    def get(self, *args, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return super().get(*args, **kwargs)
+
+
+def retrying_client(api, max_retries=5):
+    sleeps = []
+    client = plaid.RetryingClient(
+        StubClient(api),
+        plaid.TokenBucket(rate=1000, capacity=1000),
+        max_retries=max_retries,
+        sleep=sleeps.append,
+    )
+    return client, sleeps
+
+
+def test_rate_limited_calls_are_retried(app):
+    error = plaid_error("RATE_LIMIT_EXCEEDED", "TRANSACTIONS_LIMIT")
+    api = FlakyTransactions([error, error])
+    client, sleeps = retrying_client(api)
+
+    transactions = plaid.get_transactions(
+        app, "bank_0", date="2024-01-31", days=30, client=client
+    )
+
+    assert len(transactions) == 3
+    assert api.calls == 3
+    assert len(sleeps) == 2
+    assert client.metrics["retries"] == 2
+    assert client.metrics["failures"] == 0
+
+
+def test_errors_that_are_not_transient_are_not_retried():
+    api = FlakyTransactions([plaid_error("ITEM_ERROR", "ITEM_LOGIN_REQUIRED")])
+    client, sleeps = retrying_client(api)
+
+    with pytest.raises(plaid_errors.PlaidError):
+        client.Transactions.get("token-bank_0", None, None, 10, 0)
+
+    assert api.calls == 1
+    assert sleeps == []
+    assert client.metrics["failures"] == 1
+
+
+def test_retries_give_up_after_max_retries():
+    error = plaid_error("API_ERROR", "INTERNAL_SERVER_ERROR")
+    api = FlakyTransactions([error] * 10)
+    client, sleeps = retrying_client(api, max_retries=3)
+
+    with pytest.raises(plaid_errors.PlaidError):
+        client.Transactions.get("token-bank_0", None, None, 10, 0)
+
+    assert api.calls == 4
+    assert client.metrics["retries"] == 3
+    assert client.metrics["failures"] == 1
+
+
+def test_backoff_is_capped():
+    error = plaid_error("API_ERROR", "INTERNAL_SERVER_ERROR")
+    api = FlakyTransactions([error] * 8)
+    sleeps = []
+    client = plaid.RetryingClient(
+        StubClient(api),
+        plaid.TokenBucket(rate=1000, capacity=1000),
+        max_retries=8,
+        backoff=1.0,
+        max_backoff=4.0,
+        sleep=sleeps.append,
+    )
+
+    client.Transactions.get("token-bank_0", None, None, 10, 0)
+
+    assert len(sleeps) == 8
+    assert all(0 <= delay <= 4.0 for delay in sleeps)
+
+
+def test_nested_api_groups_are_wrapped():
+    class PublicToken:
+        def exchange(self, public_token):
+            return {"access_token": f"access-{public_token}"}
+
+    class ItemAPI:
+        public_token = PublicToken()
+
+    class FakeClient:
+        Item = ItemAPI()
+
+    client = plaid.RetryingClient(
+        FakeClient(), plaid.TokenBucket(rate=1000, capacity=1000)
+    )
+
+    response = client.Item.public_token.exchange("public")
+
+    assert response == {"access_token": "access-public"}
+    assert client.metrics["calls"] == 1
+
+
+def test_token_bucket_waits_for_a_token():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    bucket = plaid.TokenBucket(rate=2, capacity=2, clock=lambda: now[0])
+    for _ in range(4):
+        bucket.acquire(sleep=sleep)
+
+    # The burst is free, then one token every 1 / rate seconds
+    assert sleeps == [pytest.approx(0.5), pytest.approx(0.5)]
+    assert now[0] == pytest.approx(1.0)
+
+
+def test_threads_share_one_client(app, monkeypatch):
+    monkeypatch.setattr(plaid, "CLIENT", None)
+    monkeypatch.setattr(plaid, "Client", lambda **kwargs: object())
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        clients = list(executor.map(lambda _: plaid.get_client(app), range(8)))
+
+    assert all(client is clients[0] for client in clients)
+    assert isinstance(clients[0], plaid.RetryingClient)